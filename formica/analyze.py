@@ -0,0 +1,62 @@
+import logging
+
+from texttable import Texttable
+
+from .graph import dependencies, explicit_dependencies, levels, longest_path, redundant_dependencies
+from .report import duration_events, format_duration, latest_durations
+
+logger = logging.getLogger(__name__)
+
+
+def print_analysis(template, stack=None):
+    resources = template.get("Resources", {})
+    graph = dependencies(template)
+    durations = latest_durations(duration_events(stack, graph)) if stack else {}
+    resource_levels = levels(graph)
+    logger.info("{} resources in {} dependency levels".format(len(resources), len(resource_levels)))
+
+    weights = {name: durations[name].total_seconds() for name in durations if name in graph}
+    chain = longest_path(graph, {name: weights.get(name, 0) for name in graph} if durations else None)
+    table = Texttable(max_width=150)
+    if durations:
+        table.add_rows([["Logical ID", "Type", "Duration"]])
+        for name in chain:
+            duration = durations.get(name)
+            table.add_row([name, resources[name].get("Type", ""), format_duration(duration) if duration else ""])
+        logger.info("Longest chain of dependencies weighted with the latest durations of stack {}:".format(stack))
+    else:
+        table.add_rows([["Logical ID", "Type"]])
+        for name in chain:
+            table.add_row([name, resources[name].get("Type", "")])
+        logger.info("Longest chain of dependencies ({} resources):".format(len(chain)))
+    logger.info(table.draw())
+
+    # The number of resources CloudFormation can create in parallel once the previous level is done
+    table = Texttable(max_width=150)
+    table.add_rows([["Level", "Fan-out", "Logical IDs"]])
+    for level, names in enumerate(resource_levels):
+        table.add_row([level, len(names), ", ".join(names)])
+    logger.info("Resources per dependency level:")
+    logger.info(table.draw())
+
+    redundant = redundant_dependencies(template)
+    if redundant:
+        table = Texttable(max_width=150)
+        table.add_rows([["Logical ID", "DependsOn", "Already depends on it through"]])
+        for name, dependency, through in redundant:
+            table.add_row([name, dependency, through or "Ref, Fn::GetAtt or Fn::Sub"])
+        logger.info("DependsOn entries that can be removed as they don't change the order:")
+        logger.info(table.draw())
+
+    # Only entries on the longest chain make the deployment slower, others wait for resources in parallel
+    on_chain = set(zip(chain[1:], chain))
+    serializing = [
+        (name, dependency) for name, dependency in explicit_dependencies(template) if (name, dependency) in on_chain
+    ]
+    if serializing:
+        table = Texttable(max_width=150)
+        table.add_rows([["Logical ID", "DependsOn"]])
+        for name, dependency in serializing:
+            table.add_row([name, dependency])
+        logger.info("DependsOn entries on the longest chain without a reference, check if they are necessary:")
+        logger.info(table.draw())
@@ -1,14 +1,84 @@
-import boto3
-import botocore
-from botocore import credentials
+import threading
 import os
 
+# Connections kept open per client, so clients shared between threads don't wait for or discard connections
+MAX_POOL_CONNECTIONS = 50
+
+# Clients are created once per service and region and shared by all modules as creating them loads the endpoint and
+# service models every time. Resources aren't thread safe, so they are only shared within a thread. Both are cleared
+# whenever the profile or default region changes.
+clients = {}
+lock = threading.Lock()
+# The caller identity is only requested once per session
+identity = {}
+# Region and profile of the session, which is only set up once a client or resource is created as boto3 and botocore
+# take a while to import
+session_options = {}
+
 
 def initialize(region, profile):
+    with lock:
+        session_options.clear()
+        session_options.update(region=region, profile=profile, ready=False)
+        clients.clear()
+        identity.clear()
+
+
+def setup_session():
+    import boto3
+    import botocore.session
+    from botocore import credentials
+    from botocore.config import Config
+
+    region = session_options["region"]
+    profile = session_options["profile"]
     cli_cache = os.path.join(os.path.expanduser("~"), ".aws/cli/cache")
 
     session = botocore.session.Session(profile=profile)
     session.get_component("credential_provider").get_provider("assume-role").cache = credentials.JSONFileCache(
         cli_cache
     )
+    session.set_default_client_config(Config(max_pool_connections=MAX_POOL_CONNECTIONS))
     boto3.setup_default_session(botocore_session=session, region_name=region, profile_name=profile)
+    session_options["ready"] = True
+
+
+def client(service, region=None):
+    return __get("client", service, region)
+
+
+def resource(service, region=None):
+    return __get("resource", service, region, threading.get_ident())
+
+
+def __get(kind, service, region, thread=None):
+    key = (kind, service, region, thread)
+    # Creating clients from the same session isn't thread safe
+    with lock:
+        if key not in clients:
+            if session_options and not session_options["ready"]:
+                setup_session()
+            import boto3
+
+            create = getattr(boto3, kind)
+            clients[key] = create(service, region_name=region) if region else create(service)
+        return clients[key]
+
+
+def account_id():
+    if "Account" not in identity:
+        identity.update(client("sts").get_caller_identity())
+    return identity["Account"]
+
+
+def region():
+    return client("sts").meta.region_name
+
+
+# Forwards to the shared client, so modules can keep a client at module level without creating it at import time
+class LazyClient(object):
+    def __init__(self, service):
+        self.service = service
+
+    def __getattr__(self, name):
+        return getattr(client(self.service), name)
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIRECTORY = os.path.join(".formica", "cache")
+RENDER_CACHE_DIRECTORY = os.path.join(CACHE_DIRECTORY, "render")
+# Maximum size of all render cache entries in bytes before the least recently used ones are removed
+RENDER_CACHE_SIZE = 100 * 1024 * 1024
+# Key of the json objects yaml timestamps are stored as in the render cache
+DATE_KEY = "__formica_date__"
+
+
+def digest(*parts):
+    hash = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        hash.update(part)
+        hash.update(b"\0")
+    return hash.hexdigest()
+
+
+def file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return digest(f.read())
+    except (IOError, OSError):
+        return None
+
+
+# Cache shared by all projects of a user, e.g. for organization accounts and regions
+def user_cache_directory():
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "formica")
+
+
+# Jinja loads compiled templates with marshal, so they are kept in the private cache of the user and not in the
+# working directory where anyone able to write files could plant them
+def jinja_cache_directory():
+    return os.path.join(user_cache_directory(), "jinja")
+
+
+# Raises TypeError for values that can't be serialized
+def variables_digest(value):
+    def default(o):
+        if hasattr(o, "__dict__"):
+            return vars(o)
+        raise TypeError("Object of type {} can't be digested".format(type(o).__name__))
+
+    return digest(json.dumps(value, sort_keys=True, default=default))
+
+
+# Converts parsed templates to plain json, which unlike pickle can't run code when files in the cache directory were
+# planted. Raises TypeError for values json can't represent unchanged, e.g. keys that aren't strings.
+def encode_entry(value):
+    if isinstance(value, str) or value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError("Keys have to be strings")
+        return {key: encode_entry(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [encode_entry(item) for item in value]
+    if isinstance(value, datetime):
+        offset = value.utcoffset()
+        parts = [value.year, value.month, value.day, value.hour, value.minute, value.second, value.microsecond]
+        return {DATE_KEY: parts + [None if offset is None else offset.total_seconds()]}
+    if isinstance(value, date):
+        return {DATE_KEY: [value.year, value.month, value.day]}
+    raise TypeError("Object of type {} can't be cached".format(type(value).__name__))
+
+
+def decode_date(value):
+    if len(value) == 1 and DATE_KEY in value:
+        parts = value[DATE_KEY]
+        if len(parts) == 3:
+            return date(*parts)
+        offset = parts.pop()
+        return datetime(*parts, tzinfo=None if offset is None else timezone(timedelta(seconds=offset)))
+    return value
+
+
+class RenderCache(object):
+    def __init__(self, directory=RENDER_CACHE_DIRECTORY, max_size=RENDER_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.size = None
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        path = self.__path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f, object_hook=decode_date)
+            # Update the modification time so eviction removes the least recently used entries first
+            os.utime(path)
+            return entry
+        except (IOError, OSError, ValueError, TypeError):
+            return None
+
+    def set(self, key, entry):
+        try:
+            data = json.dumps(encode_entry(entry), separators=(",", ":")).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            logger.debug("Could not serialize render cache entry: {}".format(e))
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see a partial entry
+            handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(handle, "wb") as f:
+                f.write(data)
+            os.replace(temporary, self.__path(key))
+        except (IOError, OSError) as e:
+            logger.debug("Could not write render cache entry: {}".format(e))
+            return
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.__entries())
+        else:
+            self.size += len(data)
+        if self.size > self.max_size:
+            self.evict()
+
+    def __entries(self):
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        yield entry.path, stat.st_size, stat.st_mtime
+        except (IOError, OSError):
+            return
+
+    def evict(self):
+        entries = sorted(self.__entries(), key=lambda e: e[2])
+        size = sum(e[1] for e in entries)
+        # Evict down to 80% so not every following write triggers another eviction
+        while entries and size > self.max_size * 0.8:
+            path, entry_size, _ = entries.pop(0)
+            try:
+                os.remove(path)
+            except (IOError, OSError):
+                pass
+            size -= entry_size
+        self.size = size
+
+
+# Json entries that expire after ttl seconds
+class TimedCache(object):
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self.__path(key)) as f:
+                entry = json.load(f)
+            if time.time() - entry["time"] > self.ttl:
+                return None
+            return entry["value"]
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def set(self, key, value):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(handle, "w") as f:
+                json.dump(dict(time=time.time(), value=value), f)
+            os.replace(temporary, self.__path(key))
+        except (IOError, OSError) as e:
+            logger.debug("Could not write cache entry: {}".format(e))
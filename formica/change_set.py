@@ -3,18 +3,21 @@ import sys
 
 import logging
 from formica.s3 import temporary_bucket
-from botocore.exceptions import ClientError, WaiterError
+from botocore.exceptions import ClientError
 from texttable import Texttable
-import boto3
 
-from formica import CHANGE_SET_FORMAT
-import time
+from formica import CHANGE_SET_FORMAT, aws
+from formica.polling import Poller
 
 CHANGE_SET_HEADER = ["Action", "LogicalId", "PhysicalId", "Type", "Replacement", "Changed"]
 
 logger = logging.getLogger(__name__)
 
-cf = boto3.client("cloudformation")
+# Seconds to wait for CloudFormation to calculate the changes or to remove an existing change set
+CHANGE_SET_TIMEOUT = 1200
+REMOVE_CHANGE_SET_TIMEOUT = 500
+
+cf = aws.LazyClient("cloudformation")
 
 
 class ChangeSet:
@@ -79,23 +82,31 @@ class ChangeSet:
                 self.__change_and_wait(change_set_type, {"TemplateBody": template, **optional_arguments})
 
     def __change_and_wait(self, change_set_type, optional_arguments):
-        try:
-            cf.create_change_set(
-                StackName=self.stack,
-                ChangeSetName=self.name,
-                ChangeSetType=change_set_type,
-                **optional_arguments,
-                IncludeNestedStacks=self.nested_change_sets,
-            )
-            logger.info("Change set submitted, waiting for CloudFormation to calculate changes ...")
-            waiter = cf.get_waiter("change_set_create_complete")
-            waiter.wait(ChangeSetName=self.name, StackName=self.stack, WaiterConfig=dict(Delay=10, MaxAttempts=120))
-            logger.info("Change set created successfully")
-        except WaiterError as e:
-            status_reason = e.last_response.get("StatusReason", "")
-            logger.info(status_reason)
-            if "didn't contain changes" not in status_reason:
+        cf.create_change_set(
+            StackName=self.stack,
+            ChangeSetName=self.name,
+            ChangeSetType=change_set_type,
+            **optional_arguments,
+            IncludeNestedStacks=self.nested_change_sets,
+        )
+        logger.info("Change set submitted, waiting for CloudFormation to calculate changes ...")
+        poller = Poller(timeout=CHANGE_SET_TIMEOUT)
+        while True:
+            change_set = poller.call(cf.describe_change_set, StackName=self.stack, ChangeSetName=self.name)
+            status = change_set["Status"]
+            if status == "CREATE_COMPLETE":
+                logger.info("Change set created successfully")
+                return
+            elif status == "FAILED":
+                status_reason = change_set.get("StatusReason", "")
+                logger.info(status_reason)
+                if "didn't contain changes" not in status_reason:
+                    sys.exit(1)
+                return
+            elif poller.expired():
+                logger.info("Change set was not created within {} seconds".format(CHANGE_SET_TIMEOUT))
                 sys.exit(1)
+            poller.sleep()
 
     def __init__(self, stack, arn="", nested_change_sets=False):
         self.name = CHANGE_SET_FORMAT.format(stack=stack)
@@ -169,10 +180,11 @@ class ChangeSet:
             logger.info("Removing existing change set")
             cf.delete_change_set(ChangeSetName=id)
 
-            # Sleep to let Cloudformation remove
-            for _ in range(100):
-                cf.describe_change_set(StackName=self.stack, ChangeSetName=self.name)
-                time.sleep(5)
+            # Wait for Cloudformation to remove it
+            poller = Poller(timeout=REMOVE_CHANGE_SET_TIMEOUT)
+            while not poller.expired():
+                poller.call(cf.describe_change_set, StackName=self.stack, ChangeSetName=self.name)
+                poller.sleep()
             raise Exception("Old Change Set could not be removed, please retry")
         except ClientError as e:
             if e.response["Error"]["Code"] != "ChangeSetNotFound":
@@ -2,24 +2,27 @@
 
 import argparse
 import functools
+import json
 import logging
 import signal
+import os
+import queue
 import sys
-from botocore.exceptions import ClientError
-import argcomplete
+import threading
 
 from . import CHANGE_SET_FORMAT, __version__
-from . import stack_set
 from . import aws
-import boto3
 from .s3 import temporary_bucket
-from .helper import collect_vars, with_artifacts
+from .helper import collect_vars, configure_organization_cache, loader_options, with_artifacts, write_if_changed
 
 STACK_HEADERS = ["Name", "Created At", "Updated At", "Status"]
 RESOURCE_HEADERS = ["Logical ID", "Physical ID", "Type", "Status"]
 
 logger = logging.getLogger(__name__)
 
+# Stacks deployed and waited on at the same time with multiple --stack arguments
+MAX_PARALLEL_STACKS = 20
+
 CONFIG_FILE_ARGUMENTS = {
     "stack": str,
     "stack_set": str,
@@ -48,6 +51,7 @@ CONFIG_FILE_ARGUMENTS = {
     "organization_variables": bool,
     "organization_region_variables": bool,
     "organization_account_variables": bool,
+    "org_cache_ttl": int,
     "region_order": list,
     "failure_tolerance_count": int,
     "failure_tolerance_percentage": int,
@@ -60,7 +64,11 @@ CONFIG_FILE_ARGUMENTS = {
     "artifacts": list,
     "upload_artifacts": bool,
     "nested_change_sets": bool,
+    "nested_stacks": bool,
+    "skip_unchanged": bool,
     "disable_rollback": bool,
+    "jobs": int,
+    "no_cache": bool,
 }
 
 
@@ -101,12 +109,42 @@ def main(cli_args):
     template_parser = subparsers.add_parser("template", description="Print the current template")
     add_config_file_argument(template_parser)
     add_stack_variables_argument(template_parser)
+    add_render_arguments(template_parser)
     template_parser.add_argument("-y", "--yaml", help="print output as yaml", action="store_true")
+    template_parser.add_argument(
+        "--output", "-o", help="Stream the template to this file instead of printing it, use - for stdout"
+    )
+    template_parser.add_argument(
+        "--deps",
+        choices=["make", "json"],
+        help="Print the files the template depends on as a Makefile rule or as json instead of the template",
+    )
+    add_watch_argument(template_parser)
     add_artifacts_argument(template_parser)
     add_organization_account_template_variables(template_parser)
+    add_organization_cache_arguments(template_parser)
     add_aws_arguments(template_parser)
     template_parser.set_defaults(func=template)
 
+    # Analyze Command Arguments
+    analyze_parser = subparsers.add_parser(
+        "analyze", description="Analyze how the resource dependencies of the template limit parallel deployment"
+    )
+    add_config_file_argument(analyze_parser)
+    add_stack_variables_argument(analyze_parser)
+    add_render_arguments(analyze_parser)
+    add_artifacts_argument(analyze_parser)
+    add_organization_account_template_variables(analyze_parser)
+    add_organization_cache_arguments(analyze_parser)
+    add_aws_arguments(analyze_parser)
+    add_stack_argument(analyze_parser)
+    analyze_parser.add_argument(
+        "--durations",
+        help="Weight resources with how long their latest change took in the events of the stack",
+        action="store_true",
+    )
+    analyze_parser.set_defaults(func=analyze)
+
     # Stacks Command Arguments
     stacks_parser = subparsers.add_parser("stacks", description="List all stacks")
     add_aws_arguments(stacks_parser)
@@ -123,10 +161,12 @@ def main(cli_args):
     add_role_arn_argument(new_parser)
     add_config_file_argument(new_parser)
     add_stack_variables_argument(new_parser)
+    add_render_arguments(new_parser)
     add_s3_upload_argument(new_parser)
     add_artifacts_argument(new_parser)
     add_resource_types(new_parser)
     add_organization_account_template_variables(new_parser)
+    add_organization_cache_arguments(new_parser)
     add_upload_artifacts(new_parser)
     add_nested_change_sets(new_parser)
     new_parser.set_defaults(func=new)
@@ -141,37 +181,48 @@ def main(cli_args):
     add_role_arn_argument(change_parser)
     add_config_file_argument(change_parser)
     add_stack_variables_argument(change_parser)
+    add_render_arguments(change_parser)
     add_s3_upload_argument(change_parser)
     add_artifacts_argument(change_parser)
     add_resource_types(change_parser)
     add_create_missing_argument(change_parser)
     add_organization_account_template_variables(change_parser)
+    add_organization_cache_arguments(change_parser)
     add_use_previous(change_parser)
     add_upload_artifacts(change_parser)
     add_nested_change_sets(change_parser)
+    add_skip_unchanged_argument(change_parser)
     change_parser.set_defaults(func=change)
 
     # Deploy Command Arguments
     deploy_parser = subparsers.add_parser("deploy", description="Deploy the latest change set for a stack")
     add_aws_arguments(deploy_parser)
     add_artifacts_argument(deploy_parser)
-    add_stack_argument(deploy_parser)
+    add_stacks_argument(deploy_parser)
+    add_nested_stacks_argument(deploy_parser)
+    add_event_output_argument(deploy_parser)
     add_config_file_argument(deploy_parser)
     add_timeout_parameter(deploy_parser)
     add_disable_rollback_parameter(deploy_parser)
+    add_report_argument(deploy_parser)
+    add_skip_unchanged_argument(deploy_parser)
     deploy_parser.set_defaults(func=deploy)
 
     # Cancel Command Arguments
     cancel_parser = subparsers.add_parser("cancel", description="Cancel a Stack Update")
     add_aws_arguments(cancel_parser)
-    add_stack_argument(cancel_parser)
+    add_stacks_argument(cancel_parser)
+    add_nested_stacks_argument(cancel_parser)
+    add_event_output_argument(cancel_parser)
     add_config_file_argument(cancel_parser)
     cancel_parser.set_defaults(func=cancel)
 
     # Wait Command Arguments
     wait_parser = subparsers.add_parser("wait", description="Wait for a Stack to be deployed or removed")
     add_aws_arguments(wait_parser)
-    add_stack_argument(wait_parser)
+    add_stacks_argument(wait_parser)
+    add_nested_stacks_argument(wait_parser)
+    add_event_output_argument(wait_parser)
     add_config_file_argument(wait_parser)
     wait_parser.set_defaults(func=wait)
 
@@ -188,10 +239,13 @@ def main(cli_args):
     add_stack_argument(diff_parser)
     add_config_file_argument(diff_parser)
     add_stack_variables_argument(diff_parser)
+    add_render_arguments(diff_parser)
     add_stack_parameters_argument(diff_parser)
     add_stack_tags_argument(diff_parser)
     add_organization_account_template_variables(diff_parser)
+    add_organization_cache_arguments(diff_parser)
     add_artifacts_argument(diff_parser)
+    add_watch_argument(diff_parser)
     diff_parser.set_defaults(func=diff)
 
     # Resources Command Arguments
@@ -201,10 +255,22 @@ def main(cli_args):
     add_config_file_argument(resources_parser)
     resources_parser.set_defaults(func=resources)
 
+    # Report Command Arguments
+    report_parser = subparsers.add_parser(
+        "report", description="Print how long the resources of the last stack operation took"
+    )
+    add_aws_arguments(report_parser)
+    add_stack_argument(report_parser)
+    add_config_file_argument(report_parser)
+    add_report_top_argument(report_parser)
+    report_parser.set_defaults(func=report)
+
     # Remove Command Arguments
     remove_parser = subparsers.add_parser("remove", description="Remove the configured stack")
     add_aws_arguments(remove_parser)
-    add_stack_argument(remove_parser)
+    add_stacks_argument(remove_parser)
+    add_nested_stacks_argument(remove_parser)
+    add_event_output_argument(remove_parser)
     add_role_arn_argument(remove_parser)
     add_config_file_argument(remove_parser)
     remove_parser.set_defaults(func=remove)
@@ -212,7 +278,9 @@ def main(cli_args):
     # rollback Command Arguments
     rollback_parser = subparsers.add_parser("rollback", description="Roll back a stack when an operation fails")
     add_aws_arguments(rollback_parser)
-    add_stack_argument(rollback_parser)
+    add_stacks_argument(rollback_parser)
+    add_nested_stacks_argument(rollback_parser)
+    add_event_output_argument(rollback_parser)
     add_role_arn_argument(rollback_parser)
     add_config_file_argument(rollback_parser)
     rollback_parser.set_defaults(func=rollback)
@@ -220,8 +288,11 @@ def main(cli_args):
     # Stack Set Configuration
     stack_set_parser(subparsers)
 
-    # Autocomplete
-    argcomplete.autocomplete(parser)
+    # Autocomplete, only imported when the shell asks for completions
+    if "_ARGCOMPLETE" in os.environ:
+        import argcomplete
+
+        argcomplete.autocomplete(parser)
 
     # Argument Parsing
     args = parser.parse_args(cli_args)
@@ -231,12 +302,12 @@ def main(cli_args):
 
     args_dict = vars(args)
 
-    from botocore.exceptions import NoRegionError, ClientError, EndpointConnectionError
-    from botocore.exceptions import ProfileNotFound, NoCredentialsError
-
     try:
         # Initialise the AWS Profile and Region
         aws.initialize(args_dict.get("region"), args_dict.get("profile"))
+        configure_organization_cache(
+            args_dict.get("org_cache_ttl") or 0, args_dict.get("refresh_org_cache"), args_dict.get("profile")
+        )
 
         convert_role_name_to_arn(args)
 
@@ -245,28 +316,49 @@ def main(cli_args):
             args.func(args)
         else:
             parser.print_usage()
-    except (ProfileNotFound, NoCredentialsError, NoRegionError, EndpointConnectionError) as e:
+    except Exception as e:
+        handle_aws_error(e)
+
+
+# botocore is only imported once a command uses AWS, before that none of its errors can be raised
+def handle_aws_error(error):
+    if "botocore.exceptions" not in sys.modules:
+        raise error
+    from botocore.exceptions import NoRegionError, ClientError, EndpointConnectionError
+    from botocore.exceptions import ProfileNotFound, NoCredentialsError
+
+    if isinstance(error, (ProfileNotFound, NoCredentialsError, NoRegionError, EndpointConnectionError)):
         logger.info("Please make sure your credentials, regions and profiles are properly set:")
-        logger.info(e)
+        logger.info(error)
         sys.exit(1)
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "ValidationError":
-            logger.info(e.response["Error"]["Message"])
+    if isinstance(error, ClientError):
+        if error.response["Error"]["Code"] == "ValidationError":
+            logger.info(error.response["Error"]["Message"])
             sys.exit(1)
         else:
-            logger.info(e)
+            logger.info(error)
             sys.exit(2)
+    raise error
 
 
 def convert_role_name_to_arn(args):
     args_dict = vars(args)
-    sts = boto3.client("sts")
     if args_dict.get("role_name") and not args_dict.get("role_arn"):
-        account_id = sts.get_caller_identity()["Account"]
-        args.role_arn = "arn:aws:iam::{}:role/{}".format(account_id, args.role_name)
+        args.role_arn = "arn:aws:iam::{}:role/{}".format(aws.account_id(), args.role_name)
     if args_dict.get("administration_role_name") and not args_dict.get("administration_role_arn"):
-        account_id = sts.get_caller_identity()["Account"]
-        args.administration_role_arn = "arn:aws:iam::{}:role/{}".format(account_id, args.administration_role_name)
+        args.administration_role_arn = "arn:aws:iam::{}:role/{}".format(
+            aws.account_id(), args.administration_role_name
+        )
+
+
+# Stack set commands are only imported once they run as they load the AWS and template modules
+def stack_set_command(name):
+    def run(args):
+        from . import stack_set
+
+        return getattr(stack_set, name)(args)
+
+    return run
 
 
 def stack_set_parser(parser):
@@ -287,9 +379,11 @@ def stack_set_parser(parser):
     add_capabilities_argument(create_parser)
     add_config_file_argument(create_parser)
     add_stack_variables_argument(create_parser)
+    add_render_arguments(create_parser)
     add_stack_set_role_argument(create_parser)
     add_organization_account_template_variables(create_parser)
-    create_parser.set_defaults(func=stack_set.create_stack_set)
+    add_organization_cache_arguments(create_parser)
+    create_parser.set_defaults(func=stack_set_command("create_stack_set"))
 
     # Update
     update_parser = stack_set_subparsers.add_parser("update", description="Update a Stack Set")
@@ -301,21 +395,23 @@ def stack_set_parser(parser):
     add_capabilities_argument(update_parser)
     add_config_file_argument(update_parser)
     add_stack_variables_argument(update_parser)
+    add_render_arguments(update_parser)
     add_stack_set_role_argument(update_parser)
     add_stack_set_instance_arguments(update_parser)
     add_stack_set_main_auto_regions_accounts(update_parser)
     add_stack_set_operation_preferences(update_parser)
     add_organization_account_template_variables(update_parser)
+    add_organization_cache_arguments(update_parser)
     add_yes_parameter(update_parser)
     add_create_missing_argument(update_parser)
-    update_parser.set_defaults(func=stack_set.update_stack_set)
+    update_parser.set_defaults(func=stack_set_command("update_stack_set"))
 
     # Remove
     remove_parser = stack_set_subparsers.add_parser("remove", description="Remove a Stack Set")
     add_aws_arguments(remove_parser)
     add_stack_set_argument(remove_parser)
     add_config_file_argument(remove_parser)
-    remove_parser.set_defaults(func=stack_set.remove_stack_set)
+    remove_parser.set_defaults(func=stack_set_command("remove_stack_set"))
 
     # Add Instances
     add_instances_parser = stack_set_subparsers.add_parser("add-instances", description="Add Stack Set Instances")
@@ -324,9 +420,10 @@ def stack_set_parser(parser):
     add_stack_set_instance_arguments(add_instances_parser)
     add_config_file_argument(add_instances_parser)
     add_stack_set_main_auto_regions_accounts(add_instances_parser)
+    add_organization_cache_arguments(add_instances_parser)
     add_stack_set_operation_preferences(add_instances_parser)
     add_yes_parameter(add_instances_parser)
-    add_instances_parser.set_defaults(func=stack_set.add_stack_set_instances)
+    add_instances_parser.set_defaults(func=stack_set_command("add_stack_set_instances"))
 
     # Remove Instances
     remove_instances_parser = stack_set_subparsers.add_parser(
@@ -338,9 +435,10 @@ def stack_set_parser(parser):
     add_stack_set_instance_retain_argument(remove_instances_parser)
     add_config_file_argument(remove_instances_parser)
     add_stack_set_main_auto_regions_accounts(remove_instances_parser)
+    add_organization_cache_arguments(remove_instances_parser)
     add_stack_set_operation_preferences(remove_instances_parser)
     add_yes_parameter(remove_instances_parser)
-    remove_instances_parser.set_defaults(func=stack_set.remove_stack_set_instances)
+    remove_instances_parser.set_defaults(func=stack_set_command("remove_stack_set_instances"))
 
     # Diff
     diff_parser = stack_set_subparsers.add_parser(
@@ -352,9 +450,11 @@ def stack_set_parser(parser):
     add_stack_parameters_argument(diff_parser)
     add_stack_tags_argument(diff_parser)
     add_stack_variables_argument(diff_parser)
+    add_render_arguments(diff_parser)
     add_organization_account_template_variables(diff_parser)
+    add_organization_cache_arguments(diff_parser)
     add_stack_set_main_account_parameter(diff_parser)
-    diff_parser.set_defaults(func=stack_set.diff_stack_set)
+    diff_parser.set_defaults(func=stack_set_command("diff_stack_set"))
 
 
 def requires_stack(function):
@@ -379,6 +479,16 @@ def add_stack_argument(parser):
     parser.add_argument("--stack", "-s", help="The Stack to use", metavar="STACK")
 
 
+def add_stacks_argument(parser):
+    parser.add_argument(
+        "--stack",
+        "-s",
+        help="The Stack to use, repeat it to use multiple stacks in parallel",
+        metavar="STACK",
+        action="append",
+    )
+
+
 def add_stack_set_argument(parser):
     parser.add_argument("--stack-set", "-s", help="The Stack Set to use", metavar="STACK-Set")
 
@@ -411,6 +521,23 @@ def add_stack_variables_argument(parser):
     )
 
 
+def add_render_arguments(parser):
+    parser.add_argument(
+        "--jobs", "-j", help="Render template files in parallel with this number of processes", type=int
+    )
+    parser.add_argument(
+        "--no-cache", help="Do not use or update the render cache in .formica/cache", action="store_true"
+    )
+
+
+def add_watch_argument(parser):
+    parser.add_argument(
+        "--watch",
+        help="Keep running and render the template again whenever one of its files changes",
+        action="store_true",
+    )
+
+
 def add_stack_tags_argument(parser):
     parser.add_argument(
         "--tags",
@@ -485,6 +612,20 @@ def add_organization_account_template_variables(parser):
     )
 
 
+def add_organization_cache_arguments(parser):
+    parser.add_argument(
+        "--org-cache-ttl",
+        help="Cache organization accounts and regions in the user cache directory for this many seconds",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--refresh-org-cache",
+        help="Request organization accounts and regions again and cache them",
+        action="store_true",
+    )
+
+
 def add_stack_set_operation_preferences(parser):
     parser.add_argument("--region-order", help="Order in which to deploy to regions", nargs="+", default=[])
     failure_tolerance = parser.add_mutually_exclusive_group()
@@ -555,28 +696,138 @@ def add_nested_change_sets(parser):
     parser.add_argument("--nested-change-sets", help="Create a ChangeSet for nested Stacks", action="store_true")
 
 
+def add_nested_stacks_argument(parser):
+    parser.add_argument("--nested-stacks", help="Follow the events of nested Stacks as well", action="store_true")
+
+
+def add_skip_unchanged_argument(parser):
+    parser.add_argument(
+        "--skip-unchanged",
+        help="Skip the change set if the stack is unchanged, deploy succeeds without a change set",
+        action="store_true",
+    )
+
+
+def add_report_argument(parser):
+    parser.add_argument(
+        "--report", help="Print the slowest resources and the critical path after the deployment", action="store_true"
+    )
+
+
+def add_report_top_argument(parser):
+    parser.add_argument("--top", help="Number of slowest resources to print", type=int, default=10)
+
+
+def add_event_output_argument(parser):
+    parser.add_argument(
+        "--output",
+        help="Print stack events as a table or as one json object per line, logs are written to stderr for ndjson",
+        choices=["table", "ndjson"],
+        default="table",
+    )
+
+
 def template(args):
-    from .loader import Loader
-    import yaml
+    if args.deps and args.output == "-":
+        logger.info("--deps can't be used together with --output -")
+        sys.exit(1)
 
     variables = collect_vars(args)
+    options = loader_options(args)
+    if args.watch:
+        from .loader import create_environment
+        from .watch import watch
+
+        # Templates are only compiled again once they changed as the environment is shared across runs
+        options["env"] = create_environment(options["cache"])
+        watch(lambda: print_template(args, variables, options).watched_paths())
+    else:
+        print_template(args, variables, options)
+
 
-    loader = Loader(variables=variables)
+def analyze(args):
+    from .analyze import print_analysis
+    from .loader import Loader
+
+    if args.durations and not args.stack:
+        logger.info("--durations needs the stack set with --stack(-s) or in a config file")
+        sys.exit(1)
+    loader = Loader(variables=collect_vars(args), **loader_options(args))
     loader.load()
-    if args.yaml:
-        logger.info(
-            loader.template(
-                dumper=functools.partial(yaml.safe_dump, default_flow_style=False)
-            ).strip()  # strip trailing newline to avoid blank line in output
-        )
-    else:
-        logger.info(loader.template(indent=4, separators=(",", ": ")))
+    try:
+        print_analysis(loader.template_dictionary(), args.stack if args.durations else None)
+    except ValueError as e:
+        logger.info(e)
+        sys.exit(1)
+
+
+def print_template(args, variables, options):
+    from .loader import Loader
+    import yaml
+
+    loader = Loader(variables=variables, **options)
+    loader.load()
+    if args.output:
+
+        def dump(stream):
+            if args.yaml:
+                loader.dump(stream, dumper=functools.partial(yaml.safe_dump, default_flow_style=False))
+            else:
+                loader.dump(stream, indent=4, separators=(",", ": "))
+                stream.write("\n")
+
+        if args.output == "-":
+            dump(sys.stdout)
+            sys.stdout.flush()
+        elif not write_if_changed(args.output, dump):
+            # Build tools compare the output with its dependencies, so it has to be newer than them even if unchanged
+            if args.deps:
+                os.utime(args.output)
+            # The dependencies are printed to stdout as well, so don't mix any other output into them
+            else:
+                logger.info("Template in {} is unchanged".format(args.output))
+    if args.deps:
+        target = args.output or "template"
+        # Config files change the variables of a template so they are inputs as well
+        files = sorted(set(loader.dependency_files() + [f.name for f in vars(args).get("config_file") or []]))
+        if args.deps == "json":
+            logger.info(
+                json.dumps(
+                    dict(target=target, files=files, dependencies=loader.dependency_graph()),
+                    indent=4,
+                    sort_keys=True,
+                )
+            )
+        else:
+            logger.info(make_rule(target, files))
+    elif not args.output:
+        if args.yaml:
+            logger.info(
+                loader.template(
+                    dumper=functools.partial(yaml.safe_dump, default_flow_style=False)
+                ).strip()  # strip trailing newline to avoid blank line in output
+            )
+        else:
+            logger.info(loader.template(indent=4, separators=(",", ": ")))
+    return loader
+
+
+def make_rule(target, files):
+    def escape(path):
+        return path.replace("$", "$$").replace(" ", "\\ ").replace("#", "\\#")
+
+    lines = ["{}: \\".format(escape(target))]
+    lines.extend("    {} \\".format(escape(file)) for file in files[:-1])
+    lines.append("    {}".format(escape(files[-1])))
+    # Empty rules for every dependency so make doesn't fail once one of the files is removed
+    lines.extend("\n{}:".format(escape(file)) for file in files)
+    return "\n".join(lines)
 
 
 def stacks(args):
     from texttable import Texttable
 
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     stacks = client.describe_stacks()
     table = Texttable(max_width=150)
     table.add_rows([STACK_HEADERS])
@@ -593,7 +844,26 @@ def stacks(args):
 def diff(args):
     from .diff import compare_stack
 
-    compare_stack(stack=args.stack, vars=collect_vars(args), parameters=args.parameters, tags=args.tags)
+    variables = collect_vars(args)
+    options = loader_options(args)
+
+    def run():
+        return compare_stack(
+            stack=args.stack,
+            vars=variables,
+            parameters=args.parameters,
+            tags=args.tags,
+            loader_options=options,
+        ).watched_paths()
+
+    if args.watch:
+        from .loader import create_environment
+        from .watch import watch
+
+        options["env"] = create_environment(options["cache"])
+        watch(run)
+    else:
+        run()
 
 
 @requires_stack
@@ -628,8 +898,16 @@ def resources(args):
     logger.info(table.draw() + "\n")
 
 
+@requires_stack
+def report(args):
+    from .report import print_report
+
+    print_report(args.stack, args.top)
+
+
 @requires_stack
 def change(args):
+    from botocore.exceptions import ClientError
     from .change_set import ChangeSet
     from .loader import Loader
 
@@ -661,13 +939,32 @@ def change(args):
     if args.use_previous_template:
         options["use_previous_template"] = True
     else:
-        loader = Loader(variables=collect_vars(args))
+        loader = Loader(variables=collect_vars(args), **loader_options(args))
         loader.load()
         options["template"] = loader.template(indent=None)
 
     if args.use_previous_parameters:
         options["use_previous_parameters"] = True
 
+    if args.skip_unchanged and change_set_type == "UPDATE":
+        from .fingerprint import changes
+
+        reason = changes(
+            args.stack,
+            template=options.get("template"),
+            parameters=args.parameters,
+            tags=args.tags,
+            capabilities=args.capabilities,
+            role_arn=args.role_arn,
+            use_previous_parameters=args.use_previous_parameters,
+        )
+        if reason is None:
+            logger.info("Stack {} is unchanged, skipping the change set".format(args.stack))
+            # An older change set must not be deployed instead
+            change_set.remove_existing_changeset()
+            return
+        logger.info("Creating change set as {}".format(reason))
+
     if args.upload_artifacts:
         with temporary_bucket(seed=args.stack) as t:
             for a in args.artifacts:
@@ -680,7 +977,7 @@ def change(args):
 
 
 def cloudformation_client():
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     return client
 
 
@@ -691,22 +988,121 @@ def wait_for_stack(function):
         client = cloudformation_client()
         stack_id = client.describe_stacks(StackName=args.stack)["Stacks"][0]["StackId"]
         last_event = client.describe_stack_events(StackName=args.stack)["StackEvents"][0]["EventId"]
-        function(args, client)
+        # Commands return False if they didn't start an operation, the stack status is then left from an earlier one
+        if function(args, client) is False:
+            return
         options = {}
         if vars(args).get("timeout"):
             options["timeout"] = args.timeout
-        StackWaiter(stack_id, **options).wait(last_event)
+        if vars(args).get("stack_column"):
+            options["name"] = args.stack
+        if vars(args).get("nested_stacks"):
+            options["nested"] = True
+        if vars(args).get("output") == "ndjson":
+            options["output"] = "ndjson"
+        try:
+            StackWaiter(stack_id, **options).wait(last_event)
+        finally:
+            # Failed deployments exit while waiting, and are the ones where the report helps the most
+            if vars(args).get("report"):
+                from .report import print_report
+
+                print_report(args.stack)
 
     return stack_wait_handler
 
 
+# Runs the command for every stack given with --stack, multiple stacks are run in parallel as waiting for them is
+# mostly idle. Their events are printed with an additional stack column and the command fails if any stack failed.
+def for_each_stack(function):
+    def run_for_stacks(args):
+        # Keeps stdout free for the events so it can be parsed
+        if vars(args).get("output") == "ndjson":
+            from . import handler
+
+            # StreamHandler.setStream needs Python 3.7
+            handler.acquire()
+            try:
+                handler.flush()
+                handler.stream = sys.stderr
+            finally:
+                handler.release()
+        stacks = args.stack if isinstance(args.stack, list) else [args.stack]
+        stacks = list(dict.fromkeys(stacks))
+        if len(stacks) == 1:
+            args.stack = stacks[0]
+            function(args)
+        else:
+            run_in_parallel(function, args, stacks)
+
+    return run_for_stacks
+
+
+def run_in_parallel(function, args, stacks):
+    pending = queue.Queue()
+    for stack in stacks:
+        pending.put(stack)
+    results = {}
+
+    def worker():
+        while True:
+            try:
+                stack = pending.get_nowait()
+            except queue.Empty:
+                return
+            results[stack] = run_stack(
+                function, argparse.Namespace(**dict(vars(args), stack=stack, stack_column=True))
+            )
+
+    # Daemon threads so ctrl-c exits without waiting for the remaining stacks
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(len(stacks), MAX_PARALLEL_STACKS))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for stack in stacks:
+        logger.info("{}: {}".format(stack, "Failed" if results.get(stack, 2) else "Successful"))
+    exit_code = max(results.get(stack, 2) for stack in stacks)
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def run_stack(function, args):
+    from botocore.exceptions import ClientError
+
+    try:
+        function(args)
+        return 0
+    except SystemExit as e:
+        return e.code or 0
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ValidationError":
+            logger.info("{}: {}".format(args.stack, e.response["Error"]["Message"]))
+            return 1
+        logger.info("{}: {}".format(args.stack, e))
+        return 2
+    except Exception as e:
+        logger.info("{}: {}".format(args.stack, e))
+        return 2
+
+
+@for_each_stack
 @requires_stack
 @with_artifacts
 @wait_for_stack
 def deploy(args, client):
+    from botocore.exceptions import ClientError
+
     logger.info("Deploying Stack to {}".format(args.stack))
     change_set_name = CHANGE_SET_FORMAT.format(stack=args.stack)
-    change_set = client.describe_change_set(StackName=args.stack, ChangeSetName=change_set_name)
+    try:
+        change_set = client.describe_change_set(StackName=args.stack, ChangeSetName=change_set_name)
+    except ClientError as e:
+        if args.skip_unchanged and e.response["Error"]["Code"] == "ChangeSetNotFound":
+            logger.info("No change set found, stack {} is unchanged".format(args.stack))
+            return False
+        raise e
     status = change_set["Status"]
     reason = change_set.get("StatusReason", "")
     if status == "CREATE_COMPLETE":
@@ -720,6 +1116,7 @@ def deploy(args, client):
         sys.exit(1)
 
 
+@for_each_stack
 @requires_stack
 @wait_for_stack
 def cancel(args, client):
@@ -727,6 +1124,7 @@ def cancel(args, client):
     client.cancel_update_stack(StackName=args.stack)
 
 
+@for_each_stack
 @requires_stack
 @wait_for_stack
 def wait(args, client):
@@ -734,6 +1132,7 @@ def wait(args, client):
     pass
 
 
+@for_each_stack
 @requires_stack
 @wait_for_stack
 def remove(args, client):
@@ -744,6 +1143,7 @@ def remove(args, client):
         client.delete_stack(StackName=args.stack)
 
 
+@for_each_stack
 @requires_stack
 @wait_for_stack
 def rollback(args, client):
@@ -759,7 +1159,7 @@ def new(args):
     from .change_set import ChangeSet
     from .loader import Loader
 
-    loader = Loader(variables=collect_vars(args))
+    loader = Loader(variables=collect_vars(args), **loader_options(args))
     loader.load()
     logger.info("Creating change set for new stack, ...")
     change_set = ChangeSet(stack=args.stack, nested_change_sets=args.nested_change_sets)
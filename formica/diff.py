@@ -1,12 +1,11 @@
 import collections
 import re
-import yaml
 import logging
 from deepdiff import DeepDiff
-import boto3
 from texttable import Texttable
 
 from formica.loader import Loader
+from formica import aws, yaml_tags
 
 logger = logging.getLogger(__name__)
 
@@ -30,28 +29,30 @@ def convert(data):
         return data
 
 
-def compare_stack(stack, vars=None, parameters={}, tags={}):
-    client = boto3.client("cloudformation")
+def compare_stack(stack, vars=None, parameters={}, tags={}, loader_options=None):
+    client = aws.client("cloudformation")
     template = client.get_template(StackName=stack)["TemplateBody"]
 
     stack = client.describe_stacks(StackName=stack)["Stacks"][0]
-    __compare(template, stack, vars, parameters, tags)
+    return __compare(template, stack, vars, parameters, tags, loader_options=loader_options)
 
 
-def compare_stack_set(stack, vars=None, parameters={}, tags={}, main_account_parameter=False):
-    client = boto3.client("cloudformation")
+def compare_stack_set(stack, vars=None, parameters={}, tags={}, main_account_parameter=False, loader_options=None):
+    client = aws.client("cloudformation")
 
     stack_set = client.describe_stack_set(StackSetName=stack)["StackSet"]
-    __compare(stack_set["TemplateBody"], stack_set, vars, parameters, tags, main_account_parameter)
+    return __compare(
+        stack_set["TemplateBody"], stack_set, vars, parameters, tags, main_account_parameter, loader_options
+    )
 
 
-def __compare(template, stack, vars=None, parameters={}, tags={}, main_account_parameter=False):
+def __compare(template, stack, vars=None, parameters={}, tags={}, main_account_parameter=False, loader_options=None):
     current_parameters = {p["ParameterKey"]: p["ParameterValue"] for p in (stack.get("Parameters", []))}
     parameters = {key: str(value) for key, value in parameters.items()}
     tags = {key: str(value) for key, value in tags.items()}
     current_tags = {p["Key"]: p["Value"] for p in (stack.get("Tags", []))}
 
-    loader = Loader(variables=vars, main_account_parameter=main_account_parameter)
+    loader = Loader(variables=vars, main_account_parameter=main_account_parameter, **(loader_options or {}))
     loader.load()
     deployed_template = convert(template)
     template_parameters = {
@@ -62,11 +63,12 @@ def __compare(template, stack, vars=None, parameters={}, tags={}, main_account_p
 
     template_parameters.update(parameters)
     if isinstance(deployed_template, str):
-        deployed_template = yaml.full_load(deployed_template)
+        deployed_template = yaml_tags.load(deployed_template)
 
     __generate_table("Parameters", current_parameters, template_parameters)
     __generate_table("Tags", current_tags, tags)
     __generate_table("Template", deployed_template, convert(loader.template_dictionary()))
+    return loader
 
 
 def __generate_table(header, current, new):
@@ -0,0 +1,99 @@
+import json
+
+from . import aws, yaml_tags
+from .cache import digest
+
+# Stacks in these states run the template and parameters get_template and describe_stacks return
+STABLE_STATES = [
+    "CREATE_COMPLETE",
+    "UPDATE_COMPLETE",
+    "UPDATE_ROLLBACK_COMPLETE",
+    "IMPORT_COMPLETE",
+    "IMPORT_ROLLBACK_COMPLETE",
+]
+NO_ECHO_VALUE = "****"
+
+
+def canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def stack_digest(template, parameters, tags, capabilities, role_arn):
+    return digest(
+        canonical(template), canonical(parameters), canonical(tags), canonical(sorted(capabilities)), role_arn or ""
+    )
+
+
+def parameter_value(value):
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+# CloudFormation can't tell from the template alone whether these change anything
+def unknown_changes(template, stack):
+    if "Transform" in template or "Fn::Transform" in canonical(template):
+        return "the template uses transforms"
+    resources = template.get("Resources", {}).values()
+    if any(resource.get("Type") == "AWS::CloudFormation::Stack" for resource in resources):
+        return "the template contains nested stacks"
+    for key, parameter in template.get("Parameters", {}).items():
+        if parameter.get("NoEcho"):
+            return "parameter {} is NoEcho".format(key)
+        if str(parameter.get("Type", "")).startswith("AWS::SSM::Parameter::Value"):
+            return "parameter {} is resolved from SSM".format(key)
+    if any(p.get("ParameterValue") == NO_ECHO_VALUE for p in stack.get("Parameters", [])):
+        return "the deployed stack has NoEcho parameters"
+    return None
+
+
+# Returns why a change set is needed, or None if the rendered template, parameters, tags, capabilities and role
+# have the same fingerprint as the deployed stack. Values that aren't set are kept by CloudFormation, so they are
+# taken from the deployed stack.
+def changes(
+    stack_name,
+    template=None,
+    parameters=None,
+    tags=None,
+    capabilities=None,
+    role_arn=None,
+    use_previous_parameters=False,
+):
+    client = aws.client("cloudformation")
+    stack = client.describe_stacks(StackName=stack_name)["Stacks"][0]
+    if stack["StackStatus"] not in STABLE_STATES:
+        return "the stack is in state {}".format(stack["StackStatus"])
+
+    deployed_template = client.get_template(StackName=stack_name, TemplateStage="Original")["TemplateBody"]
+    if isinstance(deployed_template, str):
+        deployed_template = yaml_tags.load(deployed_template)
+    deployed_template = json.loads(canonical(deployed_template))
+    template = deployed_template if template is None else json.loads(template)
+
+    reason = unknown_changes(template, stack) or unknown_changes(deployed_template, stack)
+    if reason:
+        return reason
+
+    deployed_parameters = {p["ParameterKey"]: p["ParameterValue"] for p in stack.get("Parameters", [])}
+    local_parameters = {
+        key: parameter_value(parameter["Default"])
+        for key, parameter in template.get("Parameters", {}).items()
+        if "Default" in parameter
+    }
+    if use_previous_parameters:
+        local_parameters.update(
+            {key: value for key, value in deployed_parameters.items() if key in template.get("Parameters", {})}
+        )
+    local_parameters.update({key: str(value) for key, value in (parameters or {}).items()})
+
+    deployed_tags = {tag["Key"]: tag["Value"] for tag in stack.get("Tags", [])}
+    local_tags = {key: str(value) for key, value in tags.items()} if tags else deployed_tags
+    deployed_capabilities = stack.get("Capabilities", [])
+    local_capabilities = capabilities or deployed_capabilities
+    deployed_role = stack.get("RoleARN")
+
+    local = stack_digest(template, local_parameters, local_tags, local_capabilities, role_arn or deployed_role)
+    deployed = stack_digest(
+        deployed_template, deployed_parameters, deployed_tags, deployed_capabilities, deployed_role
+    )
+    if local != deployed:
+        return "the template, parameters, tags, capabilities or role changed"
+    return None
@@ -0,0 +1,137 @@
+import re
+
+# Variables in Fn::Sub strings, ${!Literal} is written as ${Literal} and isn't a reference
+SUB_VARIABLE = re.compile(r"\$\{([^!}][^}]*)\}")
+
+
+def references(value, names, found=None):
+    found = set() if found is None else found
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "Ref" and isinstance(item, str):
+                found.add(item)
+            elif key == "Fn::GetAtt":
+                found.add(item.split(".")[0] if isinstance(item, str) else item[0])
+            elif key == "Fn::Sub":
+                template, variables = (item, {}) if isinstance(item, str) else (item[0], item[1])
+                for variable in SUB_VARIABLE.findall(template):
+                    name = variable.split(".")[0].strip()
+                    if name not in variables:
+                        found.add(name)
+                references(variables, names, found)
+            else:
+                references(item, names, found)
+    elif isinstance(value, list):
+        for item in value:
+            references(item, names, found)
+    return {name for name in found if name in names}
+
+
+def depends_on(resource):
+    value = resource.get("DependsOn", [])
+    return [value] if isinstance(value, str) else list(value)
+
+
+# Resources referenced through Ref, Fn::GetAtt or Fn::Sub and the ones set in DependsOn for every resource
+def resource_references(template):
+    resources = template.get("Resources", {})
+    return {
+        name: references({key: value for key, value in resource.items() if key != "DependsOn"}, resources) - {name}
+        for name, resource in resources.items()
+    }
+
+
+def dependencies(template):
+    resources = template.get("Resources", {})
+    graph = resource_references(template)
+    for name, resource in resources.items():
+        graph[name] |= {dependency for dependency in depends_on(resource) if dependency in resources}
+    return {name: sorted(graph[name]) for name in graph}
+
+
+# Resources ordered so every resource comes after its dependencies, CloudFormation rejects templates with cycles
+def topological_order(graph):
+    remaining = {name: set(dependencies) for name, dependencies in graph.items()}
+    order = []
+    while remaining:
+        ready = sorted(name for name, dependencies in remaining.items() if not dependencies & remaining.keys())
+        if not ready:
+            raise ValueError("Circular dependency between {}".format(", ".join(sorted(remaining))))
+        order.extend(ready)
+        for name in ready:
+            del remaining[name]
+    return order
+
+
+# Every resource is on the level after the deepest of its dependencies, resources on the same level can be
+# created in parallel
+def levels(graph):
+    level = {}
+    for name in topological_order(graph):
+        level[name] = max((level[dependency] + 1 for dependency in graph[name]), default=0)
+    result = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for name in sorted(level):
+        result[level[name]].append(name)
+    return result
+
+
+# The chain of dependencies with the highest total weight, every resource weighs 1 without weights
+def longest_path(graph, weights=None):
+    weights = weights or {}
+    finish = {}
+    previous = {}
+    for name in topological_order(graph):
+        previous[name] = max(graph[name], key=lambda dependency: finish[dependency], default=None)
+        finish[name] = weights.get(name, 1) + (finish[previous[name]] if previous[name] else 0)
+    if not finish:
+        return []
+    path = [max(sorted(finish), key=lambda name: finish[name])]
+    while previous[path[-1]]:
+        path.append(previous[path[-1]])
+    return list(reversed(path))
+
+
+def ancestors(graph, name):
+    found = set()
+    pending = list(graph[name])
+    while pending:
+        dependency = pending.pop()
+        if dependency not in found:
+            found.add(dependency)
+            pending.extend(graph.get(dependency, []))
+    return found
+
+
+# DependsOn entries that don't change the order as the resource already waits for the dependency, either through a
+# reference or another dependency. Returns the resource, the dependency and the other dependency it is implied
+# through, or None if it is referenced directly.
+def redundant_dependencies(template):
+    resources = template.get("Resources", {})
+    graph = dependencies(template)
+    referenced = resource_references(template)
+    redundant = []
+    for name, resource in resources.items():
+        for dependency in depends_on(resource):
+            if dependency in referenced[name]:
+                redundant.append((name, dependency, None))
+                continue
+            through = next(
+                (other for other in graph[name] if other != dependency and dependency in ancestors(graph, other)),
+                None,
+            )
+            if through:
+                redundant.append((name, dependency, through))
+    return redundant
+
+
+# DependsOn entries that order resources which don't reference each other
+def explicit_dependencies(template):
+    resources = template.get("Resources", {})
+    referenced = resource_references(template)
+    redundant = {(name, dependency) for name, dependency, _ in redundant_dependencies(template)}
+    return [
+        (name, dependency)
+        for name, resource in resources.items()
+        for dependency in depends_on(resource)
+        if dependency in resources and dependency not in referenced[name] and (name, dependency) not in redundant
+    ]
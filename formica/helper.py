@@ -1,21 +1,73 @@
+import filecmp
+import os
+from collections import ChainMap
+from collections.abc import Mapping
+
+from . import aws
+from .cache import TimedCache, digest, user_cache_directory
 from .s3 import temporary_bucket
 
 
+class Artifact:
+    def __init__(self, key, bucket):
+        self.key = key
+        self.bucket = bucket
+
+
 def name(*names):
     name = "".join(map(lambda name: name.title(), names))
     name = "".join(e for e in name if e.isalnum())
     return name
 
 
+ACCOUNT_VARIABLES = ["AWSMainAccount", "AWSAccounts", "AWSSubAccounts"]
+REGION_VARIABLES = ["AWSRegions"]
+
+
+# Requests the values of a variable only once a template uses it, together with the other variables returned by the
+# same lookup
+class LazyVariables(Mapping):
+    def __init__(self, lookups, values=None):
+        self.lookups = lookups
+        self.values = values or {}
+
+    def __getitem__(self, key):
+        if key not in self.lookups:
+            raise KeyError(key)
+        if key not in self.values:
+            self.values.update(self.lookups[key]())
+        return self.values[key]
+
+    def __contains__(self, key):
+        return key in self.lookups
+
+    def __iter__(self):
+        return iter(self.lookups)
+
+    def __len__(self):
+        return len(self.lookups)
+
+    def __reduce__(self):
+        # Values already requested are sent to other processes with the lookups, the others are still only
+        # requested once a template uses them
+        return LazyVariables, (self.lookups, self.values)
+
+
+def has_lazy_variables(variables):
+    if isinstance(variables, LazyVariables):
+        return True
+    return isinstance(variables, ChainMap) and any(has_lazy_variables(layer) for layer in variables.maps)
+
+
 def collect_stack_set_vars(args):
     variables = args.vars or {}
-    if args.organization_variables:
-        variables.update(accounts_and_regions())
-    else:
-        if args.organization_region_variables:
-            variables.update(aws_regions())
-        if args.organization_account_variables:
-            variables.update(aws_accounts())
+    lookups = {}
+    if args.organization_variables or args.organization_account_variables:
+        lookups.update(dict.fromkeys(ACCOUNT_VARIABLES, aws_accounts))
+    if args.organization_variables or args.organization_region_variables:
+        lookups.update(dict.fromkeys(REGION_VARIABLES, aws_regions))
+    if lookups:
+        variables = ChainMap(LazyVariables(lookups), variables)
 
     return variables
 
@@ -23,32 +75,66 @@ def collect_stack_set_vars(args):
 def collect_vars(args):
     variables = collect_stack_set_vars(args)
     if args.artifacts:
-        variables.update(artifact_variables(args.artifacts, vars(args).get("stack", "")))
+        variables = ChainMap(artifact_variables(args.artifacts, vars(args).get("stack", "")), variables)
 
     return variables
 
 
-def accounts_and_regions():
-    acc = aws_accounts()
-    acc.update(aws_regions())
-    return acc
+def loader_options(args):
+    args = vars(args)
+    return dict(jobs=args.get("jobs") or 1, cache=not args.get("no_cache"))
+
+
+# Accounts and regions are only requested once per run and, with a ttl, shared between runs through the user cache
+class OrganizationCache(object):
+    def __init__(self, ttl=0, refresh=False, profile=None):
+        self.ttl = ttl
+        self.refresh = refresh
+        self.profile = profile
+        self.values = {}
+
+    def get(self, name, lookup):
+        if name not in self.values:
+            self.values[name] = self.load(name, lookup)
+        return self.values[name]
+
+    def load(self, name, lookup):
+        if not self.ttl:
+            return lookup()
+        cache = TimedCache(os.path.join(user_cache_directory(), "organization"), self.ttl)
+        key = digest(name, main_account_id(), self.profile or os.environ.get("AWS_PROFILE", ""))
+        value = None if self.refresh else cache.get(key)
+        if value is None:
+            value = lookup()
+            cache.set(key, value)
+        return value
+
+
+organization_cache = OrganizationCache()
+
+
+def configure_organization_cache(ttl=0, refresh=False, profile=None):
+    global organization_cache
+    organization_cache = OrganizationCache(ttl, refresh, profile)
 
 
 def aws_regions():
-    import boto3
+    return organization_cache.get("regions", request_regions)
+
+
+def aws_accounts():
+    return organization_cache.get("accounts", request_accounts)
 
-    ec2 = boto3.client("ec2")
+
+def request_regions():
+    ec2 = aws.client("ec2")
     regions = ec2.describe_regions()
     regions = [r["RegionName"] for r in regions["Regions"]]
     return {"AWSRegions": regions}
 
 
-def aws_accounts():
-    import boto3
-
-    organizations = boto3.client("organizations")
-    sts = boto3.client("sts")
-
+def request_accounts():
+    organizations = aws.client("organizations")
     paginator = organizations.get_paginator("list_accounts")
 
     pages = paginator.paginate()
@@ -58,7 +144,7 @@ def aws_accounts():
         for a in page["Accounts"]
         if a["Status"] == "ACTIVE"
     ]
-    account_id = sts.get_caller_identity()["Account"]
+    account_id = aws.account_id()
     return {
         "AWSMainAccount": [a for a in accounts if a["Id"] == account_id][0],
         "AWSAccounts": accounts,
@@ -67,19 +153,10 @@ def aws_accounts():
 
 
 def main_account_id():
-    import boto3
-
-    sts = boto3.client("sts")
-    identity = sts.get_caller_identity()
-    return identity["Account"]
+    return aws.account_id()
 
 
 def artifact_variables(artifacts, seed):
-    class Artifact:
-        def __init__(self, key, bucket):
-            self.key = key
-            self.bucket = bucket
-
     artifact_keys = {}
     with temporary_bucket(seed=seed) as t:
         for a in artifacts:
@@ -88,6 +165,23 @@ def artifact_variables(artifacts, seed):
     return {"artifacts": finished_vars}
 
 
+# Writes to a temporary file next to the target and only replaces the target if the content changed,
+# so its modification time is kept for build tools like make.
+def write_if_changed(path, write):
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(temporary, "w") as f:
+            write(f)
+        if os.path.isfile(path) and filecmp.cmp(temporary, path, shallow=False):
+            os.remove(temporary)
+            return False
+        os.replace(temporary, path)
+        return True
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
 def with_artifacts(function):
     def handle_artifacts(args):
         if args.artifacts:
@@ -0,0 +1,79 @@
+import fnmatch
+import functools
+import os
+import re
+
+IGNORE_FILE = ".formicaignore"
+# Never part of files(), .formica contains formica's own caches
+DEFAULT_IGNORES = [".git", ".formica"]
+
+
+@functools.lru_cache(maxsize=None)
+def pattern(glob):
+    return re.compile(fnmatch.translate(glob), re.IGNORECASE)
+
+
+def ignore_patterns(root="."):
+    patterns = list(DEFAULT_IGNORES)
+    try:
+        with open(os.path.join(root, IGNORE_FILE)) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    patterns.append(line.rstrip("/"))
+    except (IOError, OSError):
+        pass
+    return patterns
+
+
+def ignored(path, patterns):
+    name = path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatchcase(name, p) or fnmatch.fnmatchcase(path, p) for p in patterns)
+
+
+# Directory listings and the file tree are read once per run and shared by all loaders, so template and module
+# lookups and files() calls don't have to scan the file system again.
+class DirectoryIndex(object):
+    def __init__(self, root="."):
+        self.root = root
+        self.directories = {}
+        self.tree = None
+        self.queries = {}
+
+    def entries(self, path):
+        path = os.path.normpath(path)
+        if path not in self.directories:
+            with os.scandir(path) as entries:
+                self.directories[path] = [(entry.name, entry.is_dir()) for entry in entries]
+        return self.directories[path]
+
+    def names(self, path, glob):
+        matcher = pattern(glob)
+        return [name for name, _ in self.entries(path) if matcher.match(name)]
+
+    def is_dir(self, path):
+        parent, name = os.path.split(os.path.normpath(path))
+        if name in ("", os.curdir, os.pardir):
+            return os.path.isdir(path)
+        try:
+            return any(entry == name and is_dir for entry, is_dir in self.entries(parent or os.curdir))
+        except OSError:
+            return False
+
+    def files(self, glob="*"):
+        if self.tree is None:
+            self.tree = self.walk()
+        if glob not in self.queries:
+            self.queries[glob] = [f for f in self.tree if fnmatch.fnmatch(f, glob)]
+        return list(self.queries[glob])
+
+    def walk(self):
+        patterns = ignore_patterns(self.root)
+        found = set()
+        for directory, directories, files in os.walk(self.root, followlinks=True):
+            relative = os.path.relpath(directory, self.root).replace(os.path.sep, "/")
+            prefix = "" if relative == "." else relative + "/"
+            # Pruning in place keeps os.walk from descending into ignored directories
+            directories[:] = [d for d in directories if not ignored(prefix + d, patterns)]
+            found.update(prefix + f for f in files if not ignored(prefix + f, patterns))
+        return sorted(found)
@@ -1,27 +1,36 @@
 import json
+from collections import ChainMap
 import os
 import sys
-import re
 
 import logging
 import yaml
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, meta
 from jinja2.exceptions import TemplateSyntaxError, TemplateNotFound, UndefinedError
 import arrow
-import fnmatch
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-from .exceptions import FormicaArgumentException
+# orjson is an optional and considerably faster json parser for large generated templates
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
-from . import yaml_tags
-from .helper import main_account_id
+from .exceptions import FormicaArgumentException
 
-# To silence pyflakes warning of unused import
-assert yaml_tags
+from . import __version__, yaml_tags
+from .index import DirectoryIndex
+from .cache import RenderCache, digest, file_digest, jinja_cache_directory, variables_digest
+from .helper import has_lazy_variables, main_account_id
 
 logger = logging.getLogger(__name__)
 
 FILE_TYPES = ["yml", "yaml", "json"]
 
+# Template helpers whose results change between runs, templates using them are never cached
+UNCACHEABLE_HELPERS = {"now", "utcnow", "files"}
+
 RESOURCES_KEY = "Resources"
 MODULE_KEY = "From"
 
@@ -66,24 +75,126 @@ def novalue(variable):
     return False if variable is False else 0 if variable == 0 else (variable or '{"Ref": "AWS::NoValue"}')
 
 
+# Environments and indexes of ProcessPoolExecutor workers, shared by all files rendered in the same process
+worker_environments = {}
+worker_index = DirectoryIndex()
+
+
+def parse(source, file):
+    if file.lower().endswith(".json"):
+        try:
+            return json_loads(source)
+        except ValueError:
+            # Json templates were always parsed as yaml, so keep supporting yaml content in them
+            pass
+    return yaml_tags.load(source)
+
+
+def render_template(path, filename, variables, cache, file):
+    # Module level so it can be pickled and run on ProcessPoolExecutor workers
+    if cache not in worker_environments:
+        worker_environments[cache] = create_environment(cache)
+    loader = Loader(path, filename, variables, cache=cache, env=worker_environments[cache], index=worker_index)
+    return loader.render_template(file)
+
+
+class TemplateEnvironment(Environment):
+    # Set to a set to record the names of all templates loaded, e.g. through code(), file(), include or import
+    recorded = None
+
+    def get_template(self, name, parent=None, globals=None):
+        self.record([name])
+        return super(TemplateEnvironment, self).get_template(name, parent, globals)
+
+    def select_template(self, names, parent=None, globals=None):
+        self.record(names)
+        return super(TemplateEnvironment, self).select_template(names, parent, globals)
+
+    def record(self, names):
+        if self.recorded is not None:
+            self.recorded.update(name for name in names if isinstance(name, str))
+
+
+# Creates the cache directory with the first compiled template, so commands that don't render any don't create it
+class LazyBytecodeCache(FileSystemBytecodeCache):
+    def dump_bytecode(self, bucket):
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            super(LazyBytecodeCache, self).dump_bytecode(bucket)
+        except OSError as e:
+            logger.debug("Could not write template bytecode cache: {}".format(e))
+
+
+def create_environment(cache=False):
+    bytecode_cache = LazyBytecodeCache(jinja_cache_directory()) if cache else None
+    env = TemplateEnvironment(loader=FileSystemLoader("./", followlinks=True), bytecode_cache=bytecode_cache)
+    env.filters.update(
+        {
+            "code_escape": code_escape,
+            "code_array": code_array,
+            "mandatory": mandatory,
+            "resource": resource,
+            "novalue": novalue,
+        }
+    )
+    return env
+
+
 class Loader(object):
-    def __init__(self, path=".", filename="*", variables=None, main_account_parameter=False):
+    def __init__(
+        self,
+        path=".",
+        filename="*",
+        variables=None,
+        main_account_parameter=False,
+        jobs=1,
+        cache=False,
+        env=None,
+        index=None,
+        parent=None,
+    ):
         if variables is None:
             variables = {}
         self.cftemplate = {}
         self.path = path
         self.filename = filename
-        self.env = Environment(loader=FileSystemLoader("./", followlinks=True))
-        self.env.filters.update(
-            {
-                "code_escape": code_escape,
-                "code_array": code_array,
-                "mandatory": mandatory,
-                "resource": resource,
-                "novalue": novalue,
-            }
-        )
+        self.files = []
+        self.jobs = jobs or 1
+        if parent is not None:
+            # Module loaders share the caches, indexes and dependency graph of the top level loader,
+            # e.g. so every template is only compiled once
+            self.cache = parent.cache
+            self.env = parent.env
+            self.index = parent.index
+            self.dependencies = parent.dependencies
+            self.directories = parent.directories
+            self.modules = parent.modules
+            self.variable_names = parent.variable_names
+            self.template_references = parent.template_references
+        else:
+            self.cache = RenderCache() if cache else None
+            self.env = env or create_environment(cache)
+            self.index = index or DirectoryIndex()
+            # Maps every template file to the files it depends on
+            self.dependencies = {}
+            # Directories templates are matched in, new templates in them are only found by watching them
+            self.directories = set()
+            # Expanded modules by path and the variables they use, so modules used with the same properties are only
+            # loaded once
+            self.modules = {}
+            self.variable_names = {}
+            self.template_references = {}
         self.variables = variables
+        # Lazy variables are requested when they are read, which Jinja does for all variables when it copies the
+        # context for an include, so templates only get the variables they use
+        self.lazy = has_lazy_variables(variables)
+        self.helpers = dict(
+            code=self.include_file,
+            file=self.load_file,
+            files=self.list_files,
+            now=arrow.now,
+            utcnow=arrow.utcnow,
+        )
         self.main_account_parameter = main_account_parameter
 
     def include_file(self, filename, **args):
@@ -94,32 +205,49 @@ class Loader(object):
         return self.render(filename, **args)
 
     def list_files(self, filter="*"):
-        return [t for t in self.env.list_templates() if fnmatch.fnmatch(t, filter)]
+        return self.index.files(filter)
 
     def render(self, filename, **args):
         template_path = os.path.normpath("{}/{}".format(self.path, filename))
         template = self.env.get_template(template_path)
-        variables = {}
-        variables.update(self.variables)
-        variables.update(args)
-        arguments = dict(
-            code=self.include_file,
-            file=self.load_file,
-            files=self.list_files,
-            now=arrow.now,
-            utcnow=arrow.utcnow,
-            **variables,
-        )
-        return template.render(**arguments)
+        # Layered instead of merged into a new dict, so the variables aren't copied for every file that is rendered
+        variables = ChainMap(args, self.helpers, self.variables, template.globals)
+        names = self.context_variables([template_path]) if self.lazy else None
+        if names is not None:
+            variables = {name: variables[name] for name in names if name in variables}
+        try:
+            return self.env.concat(template.root_render_func(template.new_context(variables, shared=True)))
+        except Exception:
+            self.env.handle_exception()
 
     def template(self, indent=4, sort_keys=True, separators=(",", ":"), dumper=None):
         if dumper is not None:
             return dumper(self.cftemplate)
         return json.dumps(self.cftemplate, indent=indent, sort_keys=sort_keys, separators=separators)
 
+    def dump(self, stream, indent=4, sort_keys=True, separators=(",", ":"), dumper=None):
+        # Writes the template incrementally instead of building the whole encoded template in memory first
+        if dumper is not None:
+            return dumper(self.cftemplate, stream)
+        json.dump(self.cftemplate, stream, indent=indent, sort_keys=sort_keys, separators=separators)
+
     def template_dictionary(self):
         return self.cftemplate
 
+    def dependency_graph(self):
+        return {file: sorted(dependencies) for file, dependencies in sorted(self.dependencies.items())}
+
+    # Only files, as the modification time of a directory changes with every file created in it, e.g. the output
+    def dependency_files(self):
+        files = set(self.files)
+        for file, dependencies in self.dependencies.items():
+            files.add(file)
+            files.update(dependencies)
+        return sorted(files)
+
+    def watched_paths(self):
+        return sorted(set(self.dependency_files()) | self.directories | {os.path.normpath(self.path)})
+
     def merge(self, template, file):
         if template:
             for key in template.keys():
@@ -138,7 +266,7 @@ class Loader(object):
                                 and isinstance(element_value, dict)
                                 and MODULE_KEY in element_value
                             ):
-                                self.load_module(element_value[MODULE_KEY], element_key, element_value)
+                                self.load_module(element_value[MODULE_KEY], element_key, element_value, file)
                             else:
                                 self.cftemplate.setdefault(key, {})[element_key] = element_value
                 else:
@@ -147,10 +275,9 @@ class Loader(object):
         else:
             logger.info("File {} is empty".format(file))
 
-    def load_module(self, module_path, element_key, element_value):
+    def load_module(self, module_path, element_key, element_value, file=None):
         path_elements = module_path.split("::")
-        dir_pattern = re.compile(fnmatch.translate(path_elements.pop(0)), re.IGNORECASE)
-        matched_dirs = [dir for dir in os.listdir(self.path) if dir_pattern.match(dir)]
+        matched_dirs = self.index.names(self.path, path_elements.pop(0))
         matched_dir = module_path
         if matched_dirs:
             matched_dir = matched_dirs[0]
@@ -159,7 +286,7 @@ class Loader(object):
 
         file_name = "*"
 
-        if not os.path.isdir(module_path):
+        if not self.index.is_dir(module_path):
             file_name = module_path.split("/")[-1]
             module_path = "/".join(module_path.split("/")[:-1])
 
@@ -167,57 +294,231 @@ class Loader(object):
         properties["module_name"] = element_key
         vars = self.merge_variables(properties)
 
-        loader = Loader(module_path, file_name, vars)
-        loader.load()
-        self.merge(loader.template_dictionary(), file=file_name)
+        module_key = (os.path.normpath(module_path), file_name)
+        module = self.expanded_module(module_key, vars)
+        if module is None:
+            loader = Loader(module_path, file_name, vars, parent=self)
+            loader.load()
+            module = loader.template_dictionary(), loader.files
+            self.memoize_module(module_key, vars, module)
+        module_template, module_files = module
+        if file is not None:
+            self.dependencies.setdefault(self.template_path(file), set()).update(module_files)
+        self.directories.add(os.path.normpath(module_path))
+        self.merge(module_template, file=file_name)
+
+    def expanded_module(self, module_key, vars):
+        for names, used_variables_digest, module in self.modules.get(module_key, []):
+            try:
+                if variables_digest({name: vars[name] for name in names if name in vars}) == used_variables_digest:
+                    return module
+            except (TypeError, ValueError):
+                return None
+        return None
+
+    def memoize_module(self, module_key, vars, module):
+        names = self.used_variables(module[1])
+        if names & UNCACHEABLE_HELPERS:
+            return
+        try:
+            used_variables_digest = variables_digest({name: vars[name] for name in names if name in vars})
+        except (TypeError, ValueError):
+            return
+        self.modules.setdefault(module_key, []).append((names, used_variables_digest, module))
+
+    # Names of all variables used by the given templates, the files they load and their modules
+    def used_variables(self, files):
+        names = set()
+        seen = set()
+        pending = list(files)
+        while pending:
+            file = pending.pop()
+            if file in seen:
+                continue
+            seen.add(file)
+            pending.extend(self.dependencies.get(file, []))
+            if file not in self.variable_names:
+                try:
+                    source, _, _ = self.env.loader.get_source(self.env, file)
+                    self.variable_names[file] = meta.find_undeclared_variables(self.env.parse(source))
+                except TemplateNotFound:
+                    self.variable_names[file] = set()
+            names.update(self.variable_names[file])
+        return names
+
+    # Names of the variables used by the given templates and the ones they include, import or extend, None if a
+    # template loads another one by a name that is only known while rendering
+    def context_variables(self, files):
+        names = set()
+        seen = set()
+        pending = list(files)
+        while pending:
+            file = pending.pop()
+            if file in seen:
+                continue
+            seen.add(file)
+            if file not in self.template_references:
+                try:
+                    source, _, _ = self.env.loader.get_source(self.env, file)
+                    ast = self.env.parse(source)
+                    self.template_references[file] = (
+                        meta.find_undeclared_variables(ast),
+                        list(meta.find_referenced_templates(ast)),
+                    )
+                except TemplateNotFound:
+                    self.template_references[file] = (set(), [])
+            variables, references = self.template_references[file]
+            if None in references:
+                return None
+            names.update(variables)
+            pending.extend(references)
+        return names
 
     def merge_variables(self, module_vars):
-        merged_vars = {}
-        for k, v in self.variables.items():
-            merged_vars[k] = v
-        for k, v in module_vars.items():
-            merged_vars[k] = v
-        return merged_vars
+        return ChainMap(module_vars, self.variables)
+
+    def render_templates(self, files):
+        if self.jobs > 1 and len(files) > 1:
+            # Lazy variables the templates use are requested once here instead of in every worker
+            names = self.context_variables([self.template_path(file) for file in files]) if self.lazy else None
+            for name in names or []:
+                self.variables.get(name)
+            # Chunking makes sure the variables are only pickled once per chunk instead of once per file
+            chunksize = max(1, len(files) // (self.jobs * 4))
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                return list(
+                    executor.map(
+                        render_template,
+                        repeat(self.path),
+                        repeat(self.filename),
+                        repeat(self.variables),
+                        repeat(self.cache is not None),
+                        files,
+                        chunksize=chunksize,
+                    )
+                )
+        return (self.render_template(file) for file in files)
+
+    def template_path(self, file):
+        return os.path.normpath("{}/{}".format(self.path, os.path.basename(file)))
+
+    # Returns the parsed template, the files it loaded and error messages in case it couldn't be loaded
+    def render_template(self, file):
+        result = ""
+        try:
+            key = self.cache and self.cache_key(file)
+            if key:
+                cached = self.cached_template(key)
+                if cached is not None:
+                    return cached["template"], set(cached["dependencies"]), []
+            self.env.recorded = set()
+            result = str(self.render(os.path.basename(file)))
+            template = parse(result, file)
+            if key:
+                self.cache_template(key, self.env.recorded, template)
+            return template, self.env.recorded, []
+        except TemplateNotFound as e:
+            return None, None, ["File not found" + ": " + e.message, 'In: "' + file + '"']
+        except TemplateSyntaxError as e:
+            return (
+                None,
+                None,
+                [
+                    e.__class__.__name__ + ": " + e.message,
+                    'File: "' + (e.filename or file) + '", line ' + str(e.lineno),
+                ],
+            )
+        except UndefinedError as e:
+            return None, None, [e.__class__.__name__ + ": " + e.message, 'In: "' + file + '"']
+        except FormicaArgumentException as e:
+            return (
+                None,
+                None,
+                [
+                    e.__class__.__name__ + ": " + e.args[0],
+                    'For Template: "' + file + '"',
+                    "If you use it as a template make sure you're setting all necessary vars",
+                ],
+            )
+        except yaml.YAMLError as e:
+            return (
+                None,
+                None,
+                [
+                    e.__str__(),
+                    "Following is the Yaml document formica is trying to load:",
+                    "---------------------------------------------------------------------------",
+                    result,
+                    "---------------------------------------------------------------------------",
+                ],
+            )
+        finally:
+            self.env.recorded = None
+
+    def cache_key(self, file):
+        template_path = self.template_path(file)
+        source_digest = file_digest(template_path)
+        if source_digest:
+            return digest(__version__, template_path, source_digest)
+
+    # The cache is keyed by the template source and the variables it uses. Which variables those are is only
+    # known after rendering, so they are stored separately under the source key.
+    def cached_template(self, key):
+        names = self.cache.get(key)
+        if names is None:
+            return None
+        variables_key = self.variables_key(key, names)
+        entry = variables_key and self.cache.get(variables_key)
+        if entry is None:
+            return None
+        for name, source_digest in entry["dependencies"].items():
+            if file_digest(name) != source_digest:
+                return None
+        logger.debug("Using cached template for {}".format(entry["dependencies"]))
+        return entry
+
+    def cache_template(self, key, recorded, template):
+        names = set()
+        dependencies = {}
+        for name in recorded:
+            dependencies[name] = file_digest(name)
+            if dependencies[name]:
+                source, _, _ = self.env.loader.get_source(self.env, name)
+                names.update(meta.find_undeclared_variables(self.env.parse(source)))
+        if names & UNCACHEABLE_HELPERS:
+            return
+        names = sorted(names)
+        variables_key = self.variables_key(key, names)
+        if variables_key:
+            self.cache.set(key, names)
+            self.cache.set(variables_key, dict(dependencies=dependencies, template=template))
+
+    def variables_key(self, key, names):
+        try:
+            return digest(
+                key, variables_digest({name: self.variables[name] for name in names if name in self.variables})
+            )
+        except (TypeError, ValueError):
+            return None
 
     def load(self):
         files = []
 
         for file_type in FILE_TYPES:
-            pattern = re.compile(fnmatch.translate("{}.template.{}".format(self.filename, file_type)), re.IGNORECASE)
-            files.extend([filename for filename in os.listdir(self.path) if pattern.match(filename)])
+            files.extend(self.index.names(self.path, "{}.template.{}".format(self.filename, file_type)))
 
         if not files:
             logger.info("Could not find any template files in {}".format(self.path))
             sys.exit(1)
 
-        for file in files:
-            try:
-                result = str(self.render(os.path.basename(file), **self.variables))
-                template = yaml.full_load(result)
-            except TemplateNotFound as e:
-                logger.info("File not found" + ": " + e.message)
-                logger.info('In: "' + file + '"')
-                sys.exit(1)
-            except TemplateSyntaxError as e:
-                logger.info(e.__class__.__name__ + ": " + e.message)
-                logger.info('File: "' + (e.filename or file) + '", line ' + str(e.lineno))
-                sys.exit(1)
-            except UndefinedError as e:
-                logger.info(e.__class__.__name__ + ": " + e.message)
-                logger.info('In: "' + file + '"')
-                sys.exit(1)
-            except FormicaArgumentException as e:
-                logger.info(e.__class__.__name__ + ": " + e.args[0])
-                logger.info('For Template: "' + file + '"')
-                logger.info("If you use it as a template make sure you're setting all necessary vars")
-                sys.exit(1)
-            except yaml.YAMLError as e:
-                logger.info(e.__str__())
-                logger.info("Following is the Yaml document formica is trying to load:")
-                logger.info("---------------------------------------------------------------------------")
-                logger.info(result)
-                logger.info("---------------------------------------------------------------------------")
+        self.files = [self.template_path(file) for file in files]
+        for file, (template, dependencies, errors) in zip(files, self.render_templates(files)):
+            if errors:
+                for error in errors:
+                    logger.info(error)
                 sys.exit(1)
+            template_path = self.template_path(file)
+            self.dependencies.setdefault(template_path, set()).update(dependencies - {template_path})
             self.merge(template, file)
 
         if self.main_account_parameter:
@@ -0,0 +1,66 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Operations are checked quickly at first so short ones finish fast, the delay then grows so long running ones
+# don't use more API calls than necessary
+INITIAL_DELAY = 1
+MAX_DELAY = 20
+BACKOFF = 1.5
+# Delay after the API throttled a request, doubled for every following throttled request
+THROTTLING_DELAY = 5
+
+THROTTLING_ERRORS = ["Throttling", "ThrottlingException", "RequestLimitExceeded", "TooManyRequestsException"]
+
+
+def throttled(error):
+    return getattr(error, "response", {}).get("Error", {}).get("Code") in THROTTLING_ERRORS
+
+
+class Poller(object):
+    def __init__(self, initial_delay=INITIAL_DELAY, max_delay=MAX_DELAY, timeout=0):
+        self.delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.start = time.monotonic()
+
+    def sleep(self):
+        # Jitter keeps many parallel waiters from calling the API at the same time
+        time.sleep(random.uniform(self.delay / 2, self.delay))
+        self.delay = min(self.delay * BACKOFF, self.max_delay)
+
+    def expired(self):
+        return self.timeout > 0 and time.monotonic() - self.start > self.timeout
+
+    # Calls the API function again with a growing delay as long as it is throttled
+    def call(self, function, **kwargs):
+        delay = THROTTLING_DELAY
+        while True:
+            try:
+                return function(**kwargs)
+            except Exception as e:
+                if not throttled(e):
+                    raise
+                logger.debug("Request was throttled, retrying in {} seconds".format(delay))
+                time.sleep(random.uniform(delay / 2, delay))
+                delay = min(delay * 2, self.max_delay * 3)
+                self.delay = self.max_delay
+
+
+# Spaces out the calls of all threads sharing it, so together they stay below the given number of calls per second
+class RateLimiter(object):
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,151 @@
+import logging
+from datetime import timedelta
+
+from texttable import Texttable
+
+from . import aws, yaml_tags
+from .graph import dependencies, longest_path
+from .stack_waiter import StackWaiter
+
+logger = logging.getLogger(__name__)
+
+# Stack statuses an operation starts with, all events since the latest of them belong to the last operation
+OPERATION_START_STATES = ["CREATE_IN_PROGRESS", "UPDATE_IN_PROGRESS", "DELETE_IN_PROGRESS", "IMPORT_IN_PROGRESS"]
+TOP_RESOURCES = 10
+# Stack operations the durations of resources are searched in, older operations rarely tell how long a deployment
+# takes now and long lived stacks have thousands of events
+DURATION_OPERATIONS = 20
+
+
+# Events of the last stack operation, oldest first
+def operation_events(stack):
+    return stack_events(stack, until=OPERATION_START_STATES)
+
+
+# All events of the stack, or the ones since the last stack event with one of the until states, oldest first
+def stack_events(stack, until=None):
+    client = aws.client("cloudformation")
+    events = []
+    for page in client.get_paginator("describe_stack_events").paginate(StackName=stack):
+        for event in page["StackEvents"]:
+            events.append(event)
+            if until and StackWaiter.is_stack_event(event) and event["ResourceStatus"] in until:
+                return list(reversed(events))
+    return list(reversed(events))
+
+
+# Events until every resource has a completed create or update or the given number of operations started, oldest
+# first. Resources that were never deployed, e.g. because of a condition, would otherwise page the whole history.
+def duration_events(stack, resources, operations=DURATION_OPERATIONS):
+    client = aws.client("cloudformation")
+    events = []
+    started = 0
+    for page in client.get_paginator("describe_stack_events").paginate(StackName=stack):
+        for event in page["StackEvents"]:
+            events.append(event)
+            if StackWaiter.is_stack_event(event) and event["ResourceStatus"] in OPERATION_START_STATES:
+                started += 1
+                if started >= operations:
+                    return list(reversed(events))
+        if set(resources) <= latest_durations(reversed(events)).keys():
+            break
+    return list(reversed(events))
+
+
+# Pairs every *_IN_PROGRESS event of a resource with the next *_COMPLETE or *_FAILED event
+def resource_changes(events):
+    started = {}
+    for event in events:
+        if StackWaiter.is_stack_event(event):
+            continue
+        name = event["LogicalResourceId"]
+        status = event["ResourceStatus"]
+        if status.endswith("_IN_PROGRESS"):
+            started.setdefault(name, event["Timestamp"])
+        elif name in started and (status.endswith("_COMPLETE") or status.endswith("_FAILED")):
+            yield name, event, started.pop(name)
+
+
+# Resources changed multiple times, e.g. when they are rolled back, add up the time of all changes
+def resource_timings(events):
+    timings = {}
+    for name, event, start in resource_changes(events):
+        timing = timings.setdefault(name, dict(type=event["ResourceType"], start=start, duration=timedelta(0)))
+        timing["duration"] += event["Timestamp"] - start
+        timing["end"] = event["Timestamp"]
+        timing["status"] = event["ResourceStatus"]
+    return timings
+
+
+# How long the latest create or update of every resource took, deletes are left out as they don't delay a deployment
+def latest_durations(events):
+    return {
+        name: event["Timestamp"] - start
+        for name, event, start in resource_changes(events)
+        if not event["ResourceStatus"].startswith("DELETE_")
+    }
+
+
+def operation_duration(events):
+    stack_events = [event for event in events if StackWaiter.is_stack_event(event)]
+    if len(stack_events) < 2:
+        return None
+    return stack_events[-1]["Timestamp"] - stack_events[0]["Timestamp"]
+
+
+def format_duration(duration):
+    return str(timedelta(seconds=round(duration.total_seconds())))
+
+
+# The chain of dependent resources in the template that took the longest to deploy, so the deployment
+# can't be faster than it without changing the dependencies
+def critical_path(template, timings):
+    weights = {name: timing["duration"].total_seconds() for name, timing in timings.items()}
+    graph = dependencies(template)
+    return [name for name in longest_path(graph, {name: weights.get(name, 0) for name in graph}) if name in timings]
+
+
+def deployed_template(stack):
+    template = aws.client("cloudformation").get_template(StackName=stack)["TemplateBody"]
+    if isinstance(template, str):
+        template = yaml_tags.load(template)
+    return template
+
+
+def print_report(stack, top=TOP_RESOURCES):
+    events = operation_events(stack)
+    timings = resource_timings(events)
+    if not timings:
+        logger.info("No resources were changed in the last operation of stack {}".format(stack))
+        return
+    duration = operation_duration(events)
+    if duration is not None:
+        logger.info(
+            "The last operation of stack {} took {}, {} resources changed".format(
+                stack, format_duration(duration), len(timings)
+            )
+        )
+
+    slowest = sorted(timings.items(), key=lambda item: item[1]["duration"], reverse=True)[:top]
+    table = Texttable(max_width=150)
+    table.add_rows([["Logical ID", "Type", "Status", "Duration"]])
+    for name, timing in slowest:
+        table.add_row([name, timing["type"], timing["status"], format_duration(timing["duration"])])
+    logger.info("Slowest resources:")
+    logger.info(table.draw())
+
+    try:
+        path = critical_path(deployed_template(stack), timings)
+    except ValueError as e:
+        logger.info(e)
+        return
+    table = Texttable(max_width=150)
+    table.add_rows([["Logical ID", "Type", "Duration", "Total"]])
+    total = timedelta(0)
+    for name in path:
+        total += timings[name]["duration"]
+        table.add_row(
+            [name, timings[name]["type"], format_duration(timings[name]["duration"]), format_duration(total)]
+        )
+    logger.info("Critical path through the resource dependencies:")
+    logger.info(table.draw())
@@ -1,9 +1,10 @@
-import boto3
 from contextlib import contextmanager
 import logging
 from hashlib import md5
 from io import BytesIO
 
+from . import aws
+
 logger = logging.getLogger(__name__)
 
 # Using MD5 for shorter string names as Sha256 is larger than allowed bucket name characters
@@ -16,8 +17,8 @@ class TemporaryS3Bucket(object):
     def __init__(self, seed):
         self.objects = {}
         self.uploaded = False
-        self.__sts = boto3.client("sts")
         self.s3_bucket = None
+        self.__name = None
         self.files = {}
         self.seed = seed
 
@@ -34,39 +35,41 @@ class TemporaryS3Bucket(object):
         with BytesIO(body) as b:
             object_name = self.__digest(b)
         self.objects[object_name] = body
+        self.__name = None
         return object_name
 
     def add_file(self, file_name):
         with open(file_name, "rb") as f:
             object_name = self.__digest(f)
         self.files[object_name] = file_name
+        self.__name = None
         return object_name
 
+    # Only computed again after objects or files were added
     @property
     def name(self):
-        body_hashes = "".join(
-            [key for key, _ in self.objects.items()] + [key for key, _ in self.files.items()]
-        ).encode()
-        account_id = self.__sts.get_caller_identity()["Account"]
-        to_hash = self.seed + account_id + self.__sts.meta.region_name + body_hashes.decode()
-        name_digest_input = BytesIO(to_hash.encode())
-        body_hashes_hash = self.__digest(name_digest_input)
-        return "formica-deploy-{}".format(body_hashes_hash)
+        if self.__name is None:
+            body_hashes = "".join(
+                [key for key, _ in self.objects.items()] + [key for key, _ in self.files.items()]
+            ).encode()
+            to_hash = self.seed + aws.account_id() + aws.region() + body_hashes.decode()
+            name_digest_input = BytesIO(to_hash.encode())
+            body_hashes_hash = self.__digest(name_digest_input)
+            self.__name = "formica-deploy-{}".format(body_hashes_hash)
+        return self.__name
 
     def upload(self):
         if not self.uploaded:
-            s3 = boto3.resource("s3")
+            s3 = aws.resource("s3")
             self.uploaded = True
             self.s3_bucket = s3.Bucket(self.name)
             try:
-                if self.__sts.meta.region_name == "us-east-1":
+                if aws.region() == "us-east-1":
                     # To create a bucket in us-east-1 no LocationConstraint should be specified.
                     # See https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Bucket.create
                     self.s3_bucket.create()
                 else:
-                    self.s3_bucket.create(
-                        CreateBucketConfiguration=dict(LocationConstraint=self.__sts.meta.region_name)
-                    )
+                    self.s3_bucket.create(CreateBucketConfiguration=dict(LocationConstraint=aws.region()))
             except s3.meta.client.exceptions.BucketAlreadyOwnedByYou:
                 logger.info("Artifact Bucket already exists")
 
@@ -1,10 +1,10 @@
 import logging
 import sys
-import time
 from botocore.exceptions import ClientError
-import boto3
 
-from .helper import collect_stack_set_vars, main_account_id, aws_accounts, aws_regions
+from . import aws
+from .polling import Poller
+from .helper import collect_stack_set_vars, loader_options, main_account_id, aws_accounts, aws_regions
 from .diff import compare_stack_set
 from texttable import Texttable
 
@@ -48,7 +48,7 @@ def ack(message):
 @requires_stack_set
 def update_stack_set(args):
     if args.create_missing:
-        client = boto3.client("cloudformation")
+        client = aws.client("cloudformation")
         try:
             client.describe_stack_set(StackSetName=args.stack_set)
         except ClientError as e:
@@ -64,6 +64,7 @@ def update_stack_set(args):
         parameters=args.parameters,
         tags=args.tags,
         main_account_parameter=args.main_account_parameter,
+        loader_options=loader_options(args),
     )
 
     if args.yes or ack("Do you want to update the StackSet with above changes"):
@@ -76,7 +77,7 @@ def update_stack_set(args):
 @requires_stack_set
 def create_stack_set(args):
     try:
-        client = boto3.client("cloudformation")
+        client = aws.client("cloudformation")
         client.describe_stack_set(StackSetName=args.stack_set)
         logger.info(f"Stack Set {args.stack_set} already exists")
     except ClientError as e:
@@ -89,7 +90,7 @@ def create_stack_set(args):
 
 @requires_stack_set
 def remove_stack_set(args):
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     client.delete_stack_set(StackSetName=args.stack_set)
     logger.info("Removed StackSet with name {}".format(args.stack_set))
 
@@ -108,7 +109,7 @@ def accounts_table(accounts_map):
 @requires_stack_set
 @requires_accounts_regions
 def add_stack_set_instances(args):
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     paginator = client.get_paginator("list_stack_instances")
     deployed = [
         {"Account": stack["Account"], "Region": stack["Region"]}
@@ -153,7 +154,7 @@ def add_stack_set_instances(args):
 @requires_stack_set
 @requires_accounts_regions
 def remove_stack_set_instances(args):
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     preferences = operation_preferences(args)
     acc = accounts(args)
     reg = regions(args)
@@ -179,19 +180,21 @@ def diff_stack_set(args):
         parameters=args.parameters,
         tags=args.tags,
         main_account_parameter=args.main_account_parameter,
+        loader_options=loader_options(args),
     )
 
 
 def wait_for_stack_set_operation(stack_set_name, operation_id):
     logger.info("Waiting for StackSet Operation {} on StackSet {} to finish".format(operation_id, stack_set_name))
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
+    poller = Poller()
     finished = False
     status = ""
     while not finished:
-        time.sleep(5)
-        status = client.describe_stack_set_operation(StackSetName=stack_set_name, OperationId=operation_id)[
-            "StackSetOperation"
-        ]["Status"]
+        poller.sleep()
+        status = poller.call(
+            client.describe_stack_set_operation, StackSetName=stack_set_name, OperationId=operation_id
+        )["StackSetOperation"]["Status"]
         if status in STACK_SET_RUNNING_STATES:
             sys.stdout.write(".")
             sys.stdout.flush()
@@ -238,7 +241,7 @@ def regions(args):
 def __manage_stack_set(args, create):
     from .loader import Loader
 
-    client = boto3.client("cloudformation")
+    client = aws.client("cloudformation")
     params = args.parameters or {}
     account_regions = {}
     if not create:
@@ -258,7 +261,11 @@ def __manage_stack_set(args, create):
         # Necessary for python 2.7 as it can't merge dicts with **
         params.update(preferences)
 
-    loader = Loader(variables=collect_stack_set_vars(args), main_account_parameter=args.main_account_parameter)
+    loader = Loader(
+        variables=collect_stack_set_vars(args),
+        main_account_parameter=args.main_account_parameter,
+        **loader_options(args),
+    )
     loader.load()
     template = loader.template(indent=None)
 
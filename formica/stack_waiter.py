@@ -1,7 +1,10 @@
+import json
 import sys
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import boto3
+from . import aws
+from .polling import Poller, RateLimiter
 
 import logging
 from texttable import Texttable
@@ -9,6 +12,7 @@ from texttable import Texttable
 EVENT_TABLE_HEADERS = ["Timestamp", "Status", "Type", "Logical ID", "Status reason"]
 
 TABLE_COLUMN_SIZE = [28, 24, 30, 30, 50]
+STACK_COLUMN_SIZE = 30
 
 SUCCESSFUL_STATES = ["CREATE_COMPLETE", "UPDATE_COMPLETE", "DELETE_COMPLETE"]
 FAILED_STATES = [
@@ -21,74 +25,185 @@ FAILED_STATES = [
     "UPDATE_ROLLBACK_COMPLETE",
 ]
 
+# Nested stacks whose events are requested at the same time and the requests per second shared by all of them
+MAX_NESTED_STACKS = 10
+NESTED_REQUESTS_PER_SECOND = 5
+
 logger = logging.getLogger(__name__)
 
-SLEEP_TIME = 5
+nested_limiter = RateLimiter(NESTED_REQUESTS_PER_SECOND)
+# Keeps the lines of stacks waited on in parallel from mixing
+output_lock = threading.Lock()
 
-cf = boto3.client("cloudformation")
+cf = aws.LazyClient("cloudformation")
 
 
 class StackWaiter:
-    def __init__(self, stack, timeout=0):
+    # With a name every event is printed with it in an additional column, so events of stacks waited on in
+    # parallel can be told apart. With nested the events of nested stacks are printed as well, with the path of
+    # logical ids to the nested stack in that column. With the ndjson output every event is written to stdout as
+    # a json object on its own line as soon as it arrives instead.
+    def __init__(self, stack, timeout=0, name=None, nested=False, output="table"):
         self.stack = stack
         self.timeout = timeout
+        self.name = name
+        self.nested = nested
+        self.output = output
+        self.header_printed = False
 
     def wait(self, last_event):
-        header_printed = False
+        # One executor for the whole wait, so the threads aren't started again for every poll
+        executor = ThreadPoolExecutor(max_workers=MAX_NESTED_STACKS) if self.nested else None
+        try:
+            self.__wait(last_event, executor)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    def __wait(self, last_event, executor):
         finished = False
         canceled = False
         start = datetime.now()
+        poller = Poller()
+        stack_status = None
+        nested_stacks = {}
         while not finished:
-            stack_events = cf.describe_stack_events(StackName=self.stack)["StackEvents"]
-            index = next((i for i, v in enumerate(stack_events) if v["EventId"] == last_event))
-            last_event = stack_events[0]["EventId"]
-            new_events = stack_events[0:index]
+            new_events = self.new_events(last_event, poller)
             if new_events:
-                if not header_printed:
-                    self.print_header()
-                    header_printed = True
+                last_event = new_events[0]["EventId"]
                 self.print_events(new_events)
-            stack_status = self.stack_status()
+                stack_status = next((e["ResourceStatus"] for e in new_events if self.is_stack_event(e)), stack_status)
+            if self.nested:
+                self.discover_nested_stacks(new_events, self.label(), nested_stacks)
+                self.follow_nested_stacks(nested_stacks, poller, executor)
+            # Every later status change is reported through a stack event, so it's only requested once
+            if stack_status is None:
+                stack_status = poller.call(self.stack_status)
             if stack_status in SUCCESSFUL_STATES:
                 finished = True
-                logger.info("Stack Status Successful: {}".format(stack_status))
+                logger.info(self.prefix() + "Stack Status Successful: {}".format(stack_status))
             elif stack_status in FAILED_STATES:
-                logger.info("Stack Status Failed: {}".format(stack_status))
+                logger.info(self.prefix() + "Stack Status Failed: {}".format(stack_status))
                 sys.exit(1)
             elif not canceled and self.timeout > 0 and (datetime.now() - start).seconds > (self.timeout * 60):
-                logger.info("Timeout of {} minute(s) reached. Canceling Update.".format(self.timeout))
+                logger.info(self.prefix() + "Timeout of {} minute(s) reached. Canceling Update.".format(self.timeout))
                 canceled = True
                 cf.cancel_update_stack(StackName=self.stack)
             else:
-                time.sleep(SLEEP_TIME)
+                poller.sleep()
+
+    # Events are returned newest first, so only the pages up to the last seen event, or the first event since the
+    # given time, are requested
+    def new_events(self, last_event, poller, stack=None, since=None, limiter=None):
+        events = []
+        options = {}
+        while True:
+            if limiter:
+                limiter.acquire()
+            page = poller.call(cf.describe_stack_events, StackName=stack or self.stack, **options)
+            for event in page["StackEvents"]:
+                if event["EventId"] == last_event or (since and event["Timestamp"] < since):
+                    return events
+                events.append(event)
+            if not page.get("NextToken"):
+                return events
+            options["NextToken"] = page["NextToken"]
+
+    # Nested stacks are found through the in progress events of their nested stack resources in the parent stack,
+    # only events since that first event are followed so the history of existing nested stacks isn't printed. A
+    # nested stack changed again, e.g. during a rollback of the parent, is found again the same way.
+    def discover_nested_stacks(self, events, path, nested_stacks):
+        for event in reversed(events):
+            stack_id = event.get("PhysicalResourceId")
+            if (
+                event.get("ResourceType") == "AWS::CloudFormation::Stack"
+                and stack_id
+                and not self.is_stack_event(event)
+                and event.get("ResourceStatus", "").endswith("_IN_PROGRESS")
+                and stack_id not in nested_stacks
+            ):
+                nested_stacks[stack_id] = dict(
+                    path="{}/{}".format(path, event["LogicalResourceId"]), last_event=None, since=event["Timestamp"]
+                )
+
+    # The events of all nested stacks are requested in parallel and printed in order after all of them arrived.
+    # Nested stacks are no longer requested once they finished, so finished ones don't slow down the polling.
+    def follow_nested_stacks(self, nested_stacks, poller, executor):
+        if not nested_stacks:
+            return
+        stacks = list(nested_stacks.items())
+
+        def request(item):
+            stack_id, nested = item
+            return self.new_events(
+                nested["last_event"], poller, stack=stack_id, since=nested["since"], limiter=nested_limiter
+            )
+
+        results = list(executor.map(request, stacks))
+        for (stack_id, nested), events in zip(stacks, results):
+            if events:
+                nested["last_event"] = events[0]["EventId"]
+                self.print_events(events, nested["path"])
+                self.discover_nested_stacks(events, nested["path"], nested_stacks)
+                status = next((e["ResourceStatus"] for e in events if self.is_stack_event(e)), "")
+                if status.endswith("_COMPLETE") or status.endswith("_FAILED"):
+                    del nested_stacks[stack_id]
+
+    @staticmethod
+    def is_stack_event(event):
+        return event.get("PhysicalResourceId") is not None and event.get("PhysicalResourceId") == event.get("StackId")
 
     def stack_status(self):
         return cf.describe_stacks(StackName=self.stack)["Stacks"][0]["StackStatus"]
 
+    def prefix(self):
+        return "{}: ".format(self.name) if self.name else ""
+
+    # The stack name of a stack id, e.g. arn:aws:cloudformation:eu-central-1:123456789:stack/name/uuid
+    def label(self):
+        return self.name or (self.stack.split("/")[1] if self.stack.startswith("arn:") else self.stack)
+
+    def stack_column(self):
+        return bool(self.name or self.nested)
+
     def __create_table(self):
         table = Texttable()
-        table.set_cols_width(TABLE_COLUMN_SIZE)
+        table.set_cols_width([STACK_COLUMN_SIZE] + TABLE_COLUMN_SIZE if self.stack_column() else TABLE_COLUMN_SIZE)
         return table
 
     def print_header(self):
         if self.timeout > 0:
-            logger.info("Timeout set to {} minute(s)".format(self.timeout))
+            logger.info(self.prefix() + "Timeout set to {} minute(s)".format(self.timeout))
         table = self.__create_table()
-        table.add_rows([EVENT_TABLE_HEADERS])
+        table.add_rows([["Stack"] + EVENT_TABLE_HEADERS if self.stack_column() else EVENT_TABLE_HEADERS])
         table.set_deco(Texttable.BORDER | Texttable.VLINES)
         logger.info(table.draw())
 
-    def print_events(self, events):
+    def print_events(self, events, path=None):
+        if self.output == "ndjson":
+            self.write_events(events, path)
+            return
+        if not self.header_printed:
+            self.print_header()
+            self.header_printed = True
         table = self.__create_table()
         table.set_deco(0)
         for event in reversed(events):
-            table.add_row(
-                [
-                    event["Timestamp"].strftime("%Y-%m-%d %H:%M:%S %Z%z"),
-                    event["ResourceStatus"],
-                    event["ResourceType"],
-                    event["LogicalResourceId"],
-                    event.get("ResourceStatusReason", ""),
-                ]
-            )
+            row = [
+                event["Timestamp"].strftime("%Y-%m-%d %H:%M:%S %Z%z"),
+                event["ResourceStatus"],
+                event["ResourceType"],
+                event["LogicalResourceId"],
+                event.get("ResourceStatusReason", ""),
+            ]
+            table.add_row([path or self.label()] + row if self.stack_column() else row)
         logger.info(table.draw())
+
+    def write_events(self, events, path=None):
+        lines = [
+            json.dumps(dict(event, Timestamp=event["Timestamp"].isoformat(), Stack=path or self.label()), default=str)
+            for event in reversed(events)
+        ]
+        with output_lock:
+            sys.stdout.write("".join(line + "\n" for line in lines))
+            sys.stdout.flush()
@@ -0,0 +1,46 @@
+import logging
+import os
+import time
+
+from .index import DirectoryIndex
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks of the watched files
+WATCH_INTERVAL = 0.5
+
+
+def snapshot(paths):
+    state = {}
+    for path in paths:
+        try:
+            state[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            state[path] = None
+    return state
+
+
+# The file that caused an error might not be known yet, so the entries of the template directory are watched as well
+def paths_after_error(paths):
+    names = {name for name in DirectoryIndex().names(os.curdir, "*") if not name.startswith(".")}
+    return sorted(set(paths) | names | {os.curdir})
+
+
+# Calls run every time one of the files it returns changes. Polling the modification times of the template
+# dependencies only needs a handful of stat calls and works on every platform without an additional dependency.
+# Errors, e.g. from AWS requests, are logged and the files are watched again, so they don't end the session.
+def watch(run, interval=WATCH_INTERVAL):
+    paths = []
+    while True:
+        try:
+            paths = run()
+        except SystemExit:
+            # The error is already logged
+            paths = paths_after_error(paths)
+        except Exception as e:
+            logger.info(e)
+            paths = paths_after_error(paths)
+        state = snapshot(paths)
+        logger.info("Watching {} files for changes".format(len(paths)))
+        while snapshot(paths) == state:
+            time.sleep(interval)
@@ -2,8 +2,24 @@ import yaml
 from yaml.nodes import SequenceNode, ScalarNode, MappingNode, CollectionNode
 from yaml.resolver import BaseResolver
 
+# Use the libyaml based parser when PyYAML was built with it as it is considerably faster
+try:
+    from yaml import CFullLoader as FullLoader
+except ImportError:
+    from yaml import FullLoader
+
+
+class TemplateLoader(FullLoader):
+    pass
+
+
+def load(stream):
+    return yaml.load(stream, Loader=TemplateLoader)
+
 
 class BaseFunction(yaml.YAMLObject):
+    yaml_loader = [yaml.Loader, yaml.FullLoader, yaml.UnsafeLoader, TemplateLoader]
+
     @classmethod
     def tag(self, node):
         return node.lstrip("!")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# Compares parsing a large rendered template with the pure Python and the libyaml based loader.
+# Usage: PYTHONPATH=. python scripts/benchmark-yaml.py [size in MB]
+
+import sys
+import time
+
+import yaml
+
+from formica import yaml_tags
+
+RESOURCE = """  Bucket{0}:
+    Type: AWS::S3::Bucket
+    Condition: IsProduction
+    Properties:
+      BucketName: !Sub "${{AWS::StackName}}-bucket-{0}"
+      Tags:
+        - Key: Name
+          Value: !Join ["-", [!Ref Environment, "{0}"]]
+        - Key: Arn
+          Value: !GetAtt Role{0}.Arn
+      VersioningConfiguration:
+        Status: !If [IsProduction, Enabled, Suspended]
+"""
+
+
+def template(size):
+    resources = []
+    length = 0
+    while length < size:
+        resource = RESOURCE.format(len(resources))
+        resources.append(resource)
+        length += len(resource)
+    return "Resources:\n" + "".join(resources)
+
+
+def measure(loader, source):
+    start = time.perf_counter()
+    result = yaml.load(source, Loader=loader)
+    return time.perf_counter() - start, result
+
+
+def main():
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    source = template(int(size * 1024 * 1024))
+    print("Template size: {:.1f} MB".format(len(source) / 1024 / 1024))
+
+    pure, pure_result = measure(yaml.FullLoader, source)
+    print("yaml.FullLoader:          {:.2f}s".format(pure))
+    if not yaml.__with_libyaml__:
+        print("PyYAML is installed without libyaml, formica falls back to the pure Python loader")
+        return
+    fast, fast_result = measure(yaml_tags.TemplateLoader, source)
+    print("yaml_tags.TemplateLoader: {:.2f}s ({:.1f}x faster)".format(fast, pure / fast))
+    assert pure_result == fast_result
+
+
+if __name__ == "__main__":
+    main()
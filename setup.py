@@ -37,6 +37,9 @@ setup(
     packages=['formica'],
     install_requires=['boto3>=1.18.35,<2.0.0', 'texttable>=1.2.0', 'jinja2>=3.0', 'pyyaml>=4.2b1',
                       'deepdiff>=5.0.0', 'arrow>=1.0.0', 'argcomplete>=1.9.4'],
+    extras_require={
+        'fast': ['orjson'],
+    },
     entry_points={
         'console_scripts': [
             'formica=formica.cli:formica',
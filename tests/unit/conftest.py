@@ -1,5 +1,7 @@
 import pytest
 
+from formica import aws
+
 
 @pytest.fixture
 def botocore_session(mocker):
@@ -13,8 +15,8 @@ def session(botocore_session):
 
 @pytest.fixture
 def boto_client(mocker):
-    mocker.patch('formica.aws.boto3')
-    mocker.patch('formica.aws.botocore')
+    mocker.patch('boto3.setup_default_session')
+    mocker.patch('botocore.session.Session')
     return mocker.patch('boto3.client')
 
 @pytest.fixture
@@ -80,4 +82,28 @@ def temp_bucket_cli(mocker):
     t = mocker.patch('formica.cli.temporary_bucket')
     tempbucket_mock = mocker.Mock()
     t.return_value.__enter__.return_value = tempbucket_mock
-    return tempbucket_mock
\ No newline at end of file
+    return tempbucket_mock
+
+@pytest.fixture(autouse=True)
+def user_cache(tmpdir_factory, monkeypatch):
+    # Keeps compiled templates and organization values of tests out of the cache of the user running them
+    directory = tmpdir_factory.mktemp('user_cache')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(directory))
+    return directory
+
+
+@pytest.fixture(autouse=True)
+def organization_cache(mocker):
+    from formica import helper
+    cache = helper.OrganizationCache()
+    mocker.patch('formica.helper.organization_cache', cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def aws_clients():
+    aws.clients.clear()
+    aws.identity.clear()
+    yield aws.clients
+    aws.clients.clear()
+    aws.identity.clear()
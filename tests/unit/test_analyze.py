@@ -0,0 +1,93 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from path import Path
+
+from formica import cli
+from tests.unit.constants import STACK, STACK_ID
+
+TEMPLATE = {
+    'Resources': {
+        'Vpc': {'Type': 'AWS::EC2::VPC'},
+        'Subnet': {'Type': 'AWS::EC2::Subnet', 'Properties': {'VpcId': {'Ref': 'Vpc'}}},
+        'Bucket': {'Type': 'AWS::S3::Bucket'},
+        'Policy': {'Type': 'AWS::S3::BucketPolicy', 'DependsOn': ['Bucket', 'Subnet'],
+                   'Properties': {'Bucket': {'Ref': 'Bucket'}}},
+    }
+}
+
+
+@pytest.fixture
+def logger(mocker):
+    return mocker.patch('formica.analyze.logger')
+
+
+@pytest.fixture
+def cli_logger(mocker):
+    return mocker.patch('formica.cli.logger')
+
+
+def output(logger):
+    return '\n'.join([call[1][0] for call in logger.info.mock_calls])
+
+
+def write_template(template=TEMPLATE):
+    with open('test.template.json', 'w') as f:
+        f.write(json.dumps(template))
+
+
+def test_analyze_prints_chain_levels_and_dependencies(tmpdir, logger):
+    with Path(tmpdir):
+        write_template()
+        cli.main(['analyze'])
+    result = output(logger)
+    assert '4 resources in 3 dependency levels' in result
+    chain = result.split('Longest chain of dependencies (3 resources):')[1].split('Resources per dependency level')[0]
+    assert chain.index('Vpc') < chain.index('Subnet') < chain.index('Policy')
+    assert '| Bucket ' not in chain
+    assert 'Bucket, Vpc' in result
+    redundant = result.split("don't change the order:")[1]
+    assert 'Ref, Fn::GetAtt or Fn::Sub' in redundant
+    serializing = result.split('without a reference, check if they are necessary:')[1]
+    assert 'Policy' in serializing and 'Subnet' in serializing
+
+
+def test_analyze_weights_chain_with_durations(tmpdir, logger, client):
+    start = datetime(2024, 1, 1)
+
+    def event(name, status, seconds):
+        return {'EventId': name + status, 'StackId': STACK_ID, 'PhysicalResourceId': name + '-id',
+                'LogicalResourceId': name, 'ResourceType': 'Type', 'ResourceStatus': status,
+                'Timestamp': start + timedelta(seconds=seconds)}
+
+    client.get_paginator.return_value.paginate.return_value = [{'StackEvents': [
+        event('Policy', 'CREATE_COMPLETE', 1000), event('Policy', 'CREATE_IN_PROGRESS', 990),
+        event('Bucket', 'CREATE_COMPLETE', 900), event('Bucket', 'CREATE_IN_PROGRESS', 0),
+        event('Subnet', 'CREATE_COMPLETE', 20), event('Subnet', 'CREATE_IN_PROGRESS', 10),
+    ]}]
+    with Path(tmpdir):
+        write_template()
+        cli.main(['analyze', '--stack', STACK, '--durations'])
+    client.get_paginator.return_value.paginate.assert_called_with(StackName=STACK)
+    result = output(logger)
+    chain = result.split('latest durations of stack {}:'.format(STACK))[1].split('Resources per dependency level')[0]
+    assert 'Bucket' in chain and '0:15:00' in chain
+    assert '| Subnet ' not in chain
+
+
+def test_analyze_durations_need_stack(tmpdir, cli_logger):
+    with Path(tmpdir):
+        write_template()
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            cli.main(['analyze', '--durations'])
+    assert pytest_wrapped_e.value.code == 1
+
+
+def test_analyze_fails_for_circular_dependencies(tmpdir, cli_logger):
+    with Path(tmpdir):
+        write_template({'Resources': {'A': {'Type': 'T', 'DependsOn': 'B'}, 'B': {'Type': 'T', 'DependsOn': 'A'}}})
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            cli.main(['analyze'])
+    assert pytest_wrapped_e.value.code == 1
+    cli_logger.info.assert_called()
@@ -1,4 +1,5 @@
 import pytest
+from unittest.mock import call
 
 from formica import aws
 from tests.unit.constants import REGION, PROFILE
@@ -6,7 +7,7 @@ from tests.unit.constants import REGION, PROFILE
 
 @pytest.fixture
 def boto(mocker):
-    return mocker.patch('formica.aws.boto3')
+    return mocker.patch('boto3.setup_default_session')
 
 
 def test_init_without_parameters(boto, session, botocore_session, mocker):
@@ -15,7 +16,58 @@ def test_init_without_parameters(boto, session, botocore_session, mocker):
     session_mock = mocker.Mock()
     botocore_session.return_value = session_mock
 
+    mocker.patch('boto3.client')
     aws.initialize(region, profile)
+    botocore_session.assert_not_called()
+    aws.client('cloudformation')
     botocore_session.assert_called_with(profile=profile)
 
-    boto.setup_default_session.assert_called_with(botocore_session=session_mock, region_name=region, profile_name=profile)
+    boto.assert_called_with(botocore_session=session_mock, region_name=region, profile_name=profile)
+
+
+def test_init_sets_connection_pool_size(boto, botocore_session, mocker):
+    mocker.patch('boto3.client')
+    aws.initialize(REGION, PROFILE)
+    aws.client('cloudformation')
+    config = botocore_session.return_value.set_default_client_config.call_args[0][0]
+    assert config.max_pool_connections == aws.MAX_POOL_CONNECTIONS
+
+
+def test_clients_are_shared(boto_client):
+    assert aws.client('cloudformation') is aws.client('cloudformation')
+    assert aws.client('cloudformation', region='us-east-1') is aws.client('cloudformation', region='us-east-1')
+    assert boto_client.call_args_list == [call('cloudformation'),
+                                          call('cloudformation', region_name='us-east-1')]
+
+
+def test_resources_are_only_shared_within_a_thread(boto_resource):
+    import threading
+    boto_resource.side_effect = lambda *args, **kwargs: object()
+    resource = aws.resource('s3')
+    assert aws.resource('s3') is resource
+    resources = []
+    thread = threading.Thread(target=lambda: resources.append(aws.resource('s3')))
+    thread.start()
+    thread.join()
+    assert resources[0] is not resource
+
+
+def test_init_removes_shared_clients(boto, boto_client, botocore_session, aws_clients):
+    aws.client('cloudformation')
+    assert aws_clients
+    aws.initialize(REGION, PROFILE)
+    assert not aws_clients
+
+
+def test_lazy_client_forwards_to_shared_client(boto_client):
+    cf = aws.LazyClient('cloudformation')
+    boto_client.assert_not_called()
+    assert cf.describe_stacks is boto_client.return_value.describe_stacks
+    boto_client.assert_called_once_with('cloudformation')
+
+
+def test_account_id_is_requested_once(aws_client):
+    aws_client.get_caller_identity.return_value = {'Account': '1234'}
+    assert aws.account_id() == '1234'
+    assert aws.account_id() == '1234'
+    aws_client.get_caller_identity.assert_called_once_with()
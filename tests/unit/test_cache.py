@@ -0,0 +1,72 @@
+import os
+
+from datetime import date, datetime, timedelta, timezone
+
+from formica.cache import RenderCache, TimedCache, user_cache_directory, variables_digest
+
+
+def test_returns_stored_entries(tmpdir):
+    cache = RenderCache(directory=str(tmpdir))
+    cache.set('key', {'Resources': {'Test': 'Value'}})
+    assert cache.get('key') == {'Resources': {'Test': 'Value'}}
+
+
+def test_returns_none_for_missing_entries(tmpdir):
+    cache = RenderCache(directory=str(tmpdir))
+    assert cache.get('key') is None
+
+
+def test_evicts_least_recently_used_entries(tmpdir):
+    cache = RenderCache(directory=str(tmpdir), max_size=3000)
+    for key in ['first', 'second']:
+        cache.set(key, 'a' * 1000)
+    os.utime(os.path.join(str(tmpdir), 'first.json'), (0, 0))
+    os.utime(os.path.join(str(tmpdir), 'second.json'), (1, 1))
+    cache.get('first')
+    cache.set('third', 'a' * 1000)
+    assert cache.get('first') is not None
+    assert cache.get('second') is None
+    assert cache.get('third') is not None
+
+
+def test_stores_dates_of_yaml_templates(tmpdir):
+    cache = RenderCache(directory=str(tmpdir))
+    entry = {'Version': date(2010, 9, 9), 'Time': datetime(2020, 1, 2, 3, 4, 5, 6, timezone(timedelta(hours=2))),
+             'Local': datetime(2020, 1, 2, 3, 4, 5)}
+    cache.set('key', entry)
+    assert cache.get('key') == entry
+    assert cache.get('key')['Time'].utcoffset() == timedelta(hours=2)
+
+
+def test_skips_entries_json_cant_represent(tmpdir):
+    cache = RenderCache(directory=str(tmpdir))
+    cache.set('key', {1: 'Value'})
+    assert cache.get('key') is None
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_ignores_pickle_files(tmpdir):
+    import pickle
+    with open(os.path.join(str(tmpdir), 'key.pickle'), 'wb') as f:
+        pickle.dump({'Resources': {}}, f)
+    assert RenderCache(directory=str(tmpdir)).get('key') is None
+
+
+def test_variables_digest_is_independent_of_key_order():
+    assert variables_digest({'a': 1, 'b': [1, 2]}) == variables_digest({'b': [1, 2], 'a': 1})
+    assert variables_digest({'a': 1}) != variables_digest({'a': 2})
+
+
+def test_timed_cache_expires_entries(tmpdir, mocker):
+    time = mocker.patch('formica.cache.time.time', return_value=1000)
+    cache = TimedCache(str(tmpdir), 60)
+    cache.set('key', ['eu-central-1'])
+    time.return_value = 1060
+    assert cache.get('key') == ['eu-central-1']
+    time.return_value = 1061
+    assert cache.get('key') is None
+
+
+def test_user_cache_directory_uses_xdg_cache_home(monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', '/cache')
+    assert user_cache_directory() == '/cache/formica'
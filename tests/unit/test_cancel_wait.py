@@ -1,6 +1,8 @@
 import pytest
-from mock import Mock
+import sys
+from mock import Mock, call
 
+import formica
 from formica import cli
 from tests.unit.constants import STACK, STACK_ID, EVENT_ID
 
@@ -17,3 +19,57 @@ def test_wait(aws_client, stack_waiter):
     aws_client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
     aws_client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
     cli.main(['wait', '--stack', STACK])
+
+
+def test_wait_for_multiple_stacks(aws_client, stack_waiter):
+    aws_client.describe_stacks.side_effect = lambda StackName: {'Stacks': [{'StackId': StackName + '-id'}]}
+    aws_client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    cli.main(['wait', '--stack', 'a', '--stack', 'b', '--stack', 'a'])
+    assert sorted(stack_waiter.call_args_list) == [call('a-id', name='a'), call('b-id', name='b')]
+    assert stack_waiter.return_value.wait.call_count == 2
+
+
+def test_wait_for_multiple_stacks_fails_if_one_stack_fails(aws_client, stack_waiter):
+    aws_client.describe_stacks.side_effect = lambda StackName: {'Stacks': [{'StackId': StackName}]}
+    aws_client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+
+    waiters = {}
+
+    def create_waiter(stack_id, **kwargs):
+        waiters[stack_id] = Mock()
+        if stack_id == 'b':
+            waiters[stack_id].wait.side_effect = SystemExit(1)
+        return waiters[stack_id]
+
+    stack_waiter.side_effect = create_waiter
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        cli.main(['wait', '--stack', 'a', '--stack', 'b', '--stack', 'c'])
+    assert pytest_wrapped_e.value.code == 1
+    for waiter in waiters.values():
+        waiter.wait.assert_called_once_with(EVENT_ID)
+    assert sorted(waiters) == ['a', 'b', 'c']
+
+
+def test_wait_follows_nested_stacks(aws_client, stack_waiter):
+    aws_client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    aws_client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    cli.main(['wait', '--stack', STACK, '--nested-stacks'])
+    stack_waiter.assert_called_with(STACK_ID, nested=True)
+
+
+def test_wait_with_ndjson_output_logs_to_stderr(aws_client, stack_waiter, mocker):
+    mocker.patch.object(formica.handler, 'stream', sys.stdout)
+    aws_client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    aws_client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    cli.main(['wait', '--stack', STACK, '--output', 'ndjson'])
+    stack_waiter.assert_called_with(STACK_ID, output='ndjson')
+    assert formica.handler.stream is sys.stderr
+
+
+def test_wait_prints_table_by_default(aws_client, stack_waiter, mocker):
+    mocker.patch.object(formica.handler, 'stream', sys.stdout)
+    aws_client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    aws_client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    cli.main(['wait', '--stack', STACK])
+    stack_waiter.assert_called_with(STACK_ID)
+    assert formica.handler.stream is sys.stdout
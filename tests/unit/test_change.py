@@ -1,3 +1,4 @@
+import json
 import pytest
 from formica import cli
 from tests.unit.constants import REGION, PROFILE, STACK, TEMPLATE, ROLE_ARN, ACCOUNT_ID
@@ -193,3 +194,23 @@ def test_nested_change_sets(change_set, aws_client):
                                                            parameters={},
                                                            tags={}, capabilities=None, resource_types=False,
                                                            role_arn=None, s3=False, use_previous_template=True)
+
+
+def test_skip_unchanged_stack(change_set, aws_client, loader, logger):
+    template = {'Resources': {'Bucket': {'Type': 'AWS::S3::Bucket'}}}
+    loader.return_value.template.return_value = json.dumps(template)
+    aws_client.describe_stacks.return_value = {'Stacks': [{'StackStatus': 'UPDATE_COMPLETE'}]}
+    aws_client.get_template.return_value = {'TemplateBody': template}
+    cli.main(['change', '--stack', STACK, '--skip-unchanged'])
+    change_set.return_value.create.assert_not_called()
+    change_set.return_value.remove_existing_changeset.assert_called_once()
+    logger.info.assert_called_with('Stack {} is unchanged, skipping the change set'.format(STACK))
+
+
+def test_skip_unchanged_creates_change_set_for_changed_stack(change_set, aws_client, loader, logger):
+    loader.return_value.template.return_value = json.dumps({'Resources': {'Bucket': {'Type': 'AWS::S3::Bucket'}}})
+    aws_client.describe_stacks.return_value = {'Stacks': [{'StackStatus': 'UPDATE_COMPLETE'}]}
+    aws_client.get_template.return_value = {'TemplateBody': {'Resources': {}}}
+    cli.main(['change', '--stack', STACK, '--skip-unchanged'])
+    change_set.return_value.create.assert_called_once()
+    logger.info.assert_any_call('Creating change set as the template, parameters, tags, capabilities or role changed')
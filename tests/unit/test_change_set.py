@@ -2,8 +2,9 @@ import pytest
 from mock import Mock
 import json
 import copy
+import itertools
 
-from botocore.exceptions import WaiterError, ClientError
+from botocore.exceptions import ClientError
 
 from formica.change_set import ChangeSet, CHANGE_SET_HEADER
 from tests.unit.constants import (
@@ -16,7 +17,9 @@ from tests.unit.constants import (
 
 @pytest.fixture
 def time(mocker):
-    return mocker.patch('formica.change_set.time')
+    time = mocker.patch('formica.polling.time')
+    time.monotonic.side_effect = itertools.count(step=100)
+    return time
 
 
 @pytest.fixture
@@ -31,9 +34,10 @@ def logger(mocker):
 
 @pytest.fixture
 def client(mocker):
-    s3_boto = mocker.patch('formica.s3.boto3')
-    boto = mocker.patch('formica.change_set.boto3')
+    mocker.patch('boto3.client')
+    mocker.patch('boto3.resource')
     client = mocker.patch('formica.change_set.cf')
+    client.describe_change_set.return_value = {'Status': 'CREATE_COMPLETE'}
     return client
 
 
@@ -65,10 +69,7 @@ def test_submits_changeset_and_waits(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_creates_and_removes_bucket_for_s3_flag(client, temp_bucket_function, temp_bucket):
@@ -103,10 +104,7 @@ def test_submits_changeset_with_parameters(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, Parameters=Parameters, IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_submits_changeset_with_stack_tags(client):
@@ -122,10 +120,7 @@ def test_submits_changeset_with_stack_tags(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, Tags=Tags, IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_submits_changeset_with_role_arn(client):
@@ -137,10 +132,7 @@ def test_submits_changeset_with_role_arn(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, RoleARN=ROLE_ARN, IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_submits_changeset_with_capabilities(client):
@@ -153,10 +145,7 @@ def test_submits_changeset_with_capabilities(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, Capabilities=['A', 'B'], IncludeNestedStacks=False)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_change_set_with_nested_stacks(client):
@@ -168,17 +157,13 @@ def test_change_set_with_nested_stacks(client):
         StackName=STACK, TemplateBody=TEMPLATE,
         ChangeSetName=CHANGESETNAME, ChangeSetType=CHANGE_SET_TYPE, IncludeNestedStacks=True)
 
-    client.get_waiter.assert_called_with(
-        'change_set_create_complete')
-    client.get_waiter.return_value.wait.assert_called_with(
-        StackName=STACK, ChangeSetName=CHANGESETNAME, WaiterConfig={'Delay': 10, 'MaxAttempts': 120})
+    client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
 
 
 def test_prints_error_message_for_failed_submit_and_exits(capsys, logger, client):
     change_set = ChangeSet(STACK)
 
-    error = WaiterError('name', 'reason', {'StatusReason': 'StatusReason'})
-    client.get_waiter.return_value.wait.side_effect = error
+    client.describe_change_set.return_value = {'Status': 'FAILED', 'StatusReason': 'StatusReason'}
 
     with pytest.raises(SystemExit) as pytest_wrapped_e:
         change_set.create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
@@ -189,8 +174,7 @@ def test_prints_error_message_for_failed_submit_and_exits(capsys, logger, client
 def test_prints_error_message_and_does_not_fail_without_StatusReason(capsys, logger, client):
     change_set = ChangeSet(STACK)
 
-    error = WaiterError('name', 'reason', {})
-    client.get_waiter.return_value.wait.side_effect = error
+    client.describe_change_set.return_value = {'Status': 'FAILED'}
 
     with pytest.raises(SystemExit) as pytest_wrapped_e:
         change_set.create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
@@ -203,22 +187,42 @@ def test_prints_error_message_but_exits_successfully_for_no_changes(capsys, logg
     status_reason = "The submitted information didn't contain changes. " \
                     "Submit different information to create a change set."
 
-    error = WaiterError('name', 'reason', {'StatusReason': status_reason})
-    client.get_waiter.return_value.wait.side_effect = error
+    client.describe_change_set.return_value = {'Status': 'FAILED', 'StatusReason': status_reason}
 
     change_set.create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
     logger.info.assert_called_with(status_reason)
 
 
+def test_polls_change_set_until_created(client, logger, time):
+    change_set = ChangeSet(STACK)
+    client.describe_change_set.side_effect = [
+        {'Status': 'CREATE_PENDING'}, {'Status': 'CREATE_IN_PROGRESS'}, {'Status': 'CREATE_COMPLETE'}]
+
+    change_set.create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
+
+    assert client.describe_change_set.call_count == 3
+    assert time.sleep.call_count == 2
+    logger.info.assert_called_with('Change set created successfully')
+
+
+def test_exits_if_change_set_is_not_created_in_time(client, time):
+    change_set = ChangeSet(STACK)
+    client.describe_change_set.return_value = {'Status': 'CREATE_IN_PROGRESS'}
+
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        change_set.create(template=TEMPLATE, change_set_type=CHANGE_SET_TYPE)
+    assert pytest_wrapped_e.value.code == 1
+
+
 def test_remove_existing_changeset_for_update_type(mocker, capsys, client, change_set_not_found, time):
     mocker.patch.object(ChangeSet, 'describe')
     change_set = ChangeSet(STACK)
     client.describe_change_set.side_effect = [
-        {"ChangeSetId": CHANGESETNAME}, {}, change_set_not_found]
+        {"ChangeSetId": CHANGESETNAME}, {}, change_set_not_found, {'Status': 'CREATE_COMPLETE'}]
     change_set.create(template=TEMPLATE, change_set_type='UPDATE')
     client.describe_change_set.assert_called_with(StackName=STACK, ChangeSetName=CHANGESETNAME)
     client.delete_change_set.assert_called_with(ChangeSetName=CHANGESETNAME)
-    time.sleep.assert_called_with(5)
+    time.sleep.assert_called_once()
 
 
 def test_do_not_remove_changeset_if_non_existent(client, change_set_not_found):
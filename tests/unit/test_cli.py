@@ -1,4 +1,9 @@
+import os
+import subprocess
+import sys
+
 import pytest
+from path import Path
 from formica import cli, __version__
 from botocore.exceptions import ProfileNotFound, NoCredentialsError, NoRegionError, ClientError
 
@@ -6,6 +11,10 @@ from tests.unit.constants import STACK, MESSAGE
 
 METHODS = ['change', 'deploy', 'new', 'remove', 'resources']
 NO_STACK_METHODS = ['stacks']
+HEAVY_MODULES = ['boto3', 'botocore', 'jinja2', 'yaml', 'deepdiff', 'texttable', 'argcomplete', 'arrow']
+# Seconds importing the cli and printing the version may take. It takes below 0.1 seconds, the budget leaves room for
+# slow CI machines while HEAVY_MODULES catches single heavy imports.
+STARTUP_TIME_BUDGET = 0.5
 
 Exceptions = [ProfileNotFound, NoCredentialsError, NoRegionError, ClientError]
 
@@ -14,6 +23,15 @@ Exceptions = [ProfileNotFound, NoCredentialsError, NoRegionError, ClientError]
 def logger(mocker):
     return mocker.patch('formica.cli.logger')
 
+
+@pytest.fixture
+def template_file(tmpdir):
+    # Commands creating change sets render the template before they use AWS
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Resources": {}}')
+        yield
+
 def test_fails_for_no_arguments(capsys):
     with pytest.raises(SystemExit):
         cli.main([])
@@ -28,7 +46,7 @@ def test_prints_version(capsys):
     assert __version__.strip() in out
 
 
-def test_commands_use_exception_handling(session, logger):
+def test_commands_use_exception_handling(session, logger, template_file):
     session.side_effect = NoCredentialsError()
     for method in METHODS:
         with pytest.raises(SystemExit) as pytest_wrapped_e:
@@ -41,7 +59,7 @@ def test_commands_use_exception_handling(session, logger):
         assert pytest_wrapped_e.value.code == 1
 
 
-def test_catches_client_errors(session, logger):
+def test_catches_client_errors(session, logger, template_file):
     session.side_effect = ClientError({'Error': {'Code': 'ValidationError', 'Message': MESSAGE}}, 'ERROR_TEST')
     for method in METHODS:
         with pytest.raises(SystemExit) as pytest_wrapped_e:
@@ -55,7 +73,7 @@ def test_catches_client_errors(session, logger):
         assert pytest_wrapped_e.value.code == 1
 
 
-def test_catches_arbitrary_client_error(session, logger):
+def test_catches_arbitrary_client_error(session, logger, template_file):
     error = ClientError({'Error': {'Code': 'SOMEOTHER', 'Message': MESSAGE}}, 'ERROR_TEST')
     session.side_effect = error
     for method in METHODS:
@@ -70,6 +88,46 @@ def test_catches_arbitrary_client_error(session, logger):
         assert pytest_wrapped_e.value.code == 2
 
 
+def test_version_does_not_import_aws_or_template_modules():
+    # Keeps startup fast for shell completion and wrapper scripts, run in a new interpreter so
+    # modules imported by other tests don't count
+    code = (
+        'import sys, time\n'
+        'start = time.perf_counter()\n'
+        'from formica import cli\n'
+        'try:\n'
+        '    cli.main(["--version"])\n'
+        'except SystemExit:\n'
+        '    pass\n'
+        'print(time.perf_counter() - start, file=sys.stderr)\n'
+        'print([m for m in {} if m in sys.modules], file=sys.stderr)'.format(HEAVY_MODULES)
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    duration, modules = result.stderr.strip().splitlines()
+    assert __version__ in result.stdout
+    assert modules == '[]'
+    assert float(duration) < STARTUP_TIME_BUDGET
+
+
+def test_template_does_not_import_aws_modules(tmpdir):
+    code = (
+        'import sys\n'
+        'from formica import cli\n'
+        'cli.main(["template"])\n'
+        'print([m for m in ["boto3", "botocore"] if m in sys.modules], file=sys.stderr)'
+    )
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Resources": {}}')
+        result = subprocess.run(
+            [sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+            check=True, env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(cli.__file__)))
+        )
+    assert result.stderr.strip() == '[]'
+
+
 def test_fails_with_wrong_parameter_format(capsys):
     with pytest.raises(SystemExit) as pytest_wrapped_e:
         cli.main(['new', '--stack', STACK, '--parameters', 'Test:Test'])
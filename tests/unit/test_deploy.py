@@ -1,7 +1,7 @@
 import pytest
 from mock import Mock
 
-from botocore.exceptions import NoCredentialsError
+from botocore.exceptions import ClientError, NoCredentialsError
 
 from formica import cli
 from tests.unit.constants import STACK, STACK_ID, PROFILE, REGION, CHANGESETNAME, EVENT_ID
@@ -83,3 +83,59 @@ def test_does_not_execute_changeset_if_in_failed_state(stack_waiter, client):
     with pytest.raises(SystemExit):
         cli.main(['deploy', '--stack', STACK])
     client.execute_change_set.assert_not_called()
+
+
+def test_deploys_multiple_stacks(stack_waiter, client):
+    client.describe_change_set.return_value = {'Status': 'CREATE_COMPLETE'}
+    client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    cli.main(['deploy', '--stack', 'a', '--stack', 'b'])
+    assert sorted(c[1]['StackName'] for c in client.execute_change_set.call_args_list) == ['a', 'b']
+    assert stack_waiter.return_value.wait.call_count == 2
+
+
+def test_deploy_multiple_stacks_returns_highest_exit_code(stack_waiter, client, logger):
+    client.describe_change_set.side_effect = lambda StackName, ChangeSetName: {
+        'Status': 'FAILED' if StackName == 'b' else 'CREATE_COMPLETE'}
+    client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        cli.main(['deploy', '--stack', 'a', '--stack', 'b'])
+    assert pytest_wrapped_e.value.code == 1
+    client.execute_change_set.assert_called_once_with(ChangeSetName='a-change-set', StackName='a',
+                                                      DisableRollback=False)
+    logger.info.assert_any_call('a: Successful')
+    logger.info.assert_any_call('b: Failed')
+
+
+def test_deploy_without_change_set_succeeds_with_skip_unchanged(stack_waiter, client, logger):
+    client.describe_change_set.side_effect = ClientError(dict(Error=dict(Code='ChangeSetNotFound')),
+                                                         'DescribeChangeSet')
+    client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    cli.main(['deploy', '--stack', STACK, '--skip-unchanged'])
+    client.execute_change_set.assert_not_called()
+    logger.info.assert_called_with('No change set found, stack {} is unchanged'.format(STACK))
+
+
+@pytest.mark.parametrize('status', ['UPDATE_ROLLBACK_COMPLETE', 'IMPORT_COMPLETE', 'IMPORT_ROLLBACK_COMPLETE'])
+def test_deploy_without_change_set_does_not_wait_for_earlier_operation(client, logger, mocker, status):
+    report = mocker.patch('formica.report.print_report')
+    client.describe_change_set.side_effect = ClientError(dict(Error=dict(Code='ChangeSetNotFound')),
+                                                         'DescribeChangeSet')
+    client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID, 'StackStatus': status}]}
+    cli.main(['deploy', '--stack', STACK, '--skip-unchanged', '--report'])
+    client.describe_stack_events.assert_called_once_with(StackName=STACK)
+    client.describe_stacks.assert_called_once_with(StackName=STACK)
+    report.assert_not_called()
+
+
+def test_deploy_without_change_set_fails(stack_waiter, client, logger):
+    client.describe_change_set.side_effect = ClientError(dict(Error=dict(Code='ChangeSetNotFound')),
+                                                         'DescribeChangeSet')
+    client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        cli.main(['deploy', '--stack', STACK])
+    assert pytest_wrapped_e.value.code == 2
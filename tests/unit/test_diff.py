@@ -1,8 +1,10 @@
 import json
+import os
 
 import pytest
 import yaml
 from formica import cli
+from path import Path
 from uuid import uuid4
 
 from formica.diff import compare_stack, compare_stack_set
@@ -139,7 +141,20 @@ def test_yaml_tags(loader, client, caplog):
 def test_diff_cli_with_vars(template, mocker):
     diff = mocker.patch('formica.diff.compare_stack')
     cli.main(['diff', '--stack', STACK, '--vars', 'V=1', '--parameters', 'P=2', '--tags', 'T=3'])
-    diff.assert_called_with(stack=STACK, vars={'V': '1'}, parameters={'P': '2'}, tags={'T': '3'})
+    diff.assert_called_with(stack=STACK, vars={'V': '1'}, parameters={'P': '2'}, tags={'T': '3'},
+                            loader_options={'jobs': 1, 'cache': True})
+
+
+def test_diff_cli_with_watch(template, mocker, tmpdir):
+    diff = mocker.patch('formica.diff.compare_stack')
+    diff.return_value.watched_paths.return_value = ['test.template.json']
+    watch = mocker.patch('formica.watch.watch')
+    with Path(tmpdir):
+        cli.main(['diff', '--stack', STACK, '--watch'])
+        diff.assert_not_called()
+        assert watch.call_args[0][0]() == ['test.template.json']
+        assert diff.call_args[1]['loader_options']['env'] is not None
+        assert not os.path.exists('.formica')
 
 
 def test_diff_parameters(caplog, loader, client):
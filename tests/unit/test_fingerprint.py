@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from formica.fingerprint import changes, stack_digest
+from tests.unit.constants import STACK, ROLE_ARN
+
+TEMPLATE = {
+    'Parameters': {'Size': {'Type': 'Number', 'Default': 1}, 'Name': {'Type': 'String'}},
+    'Resources': {'Bucket': {'Type': 'AWS::S3::Bucket', 'Properties': {'BucketName': {'Ref': 'Name'}}}},
+}
+
+
+@pytest.fixture
+def deployed(client):
+    stack = {
+        'StackStatus': 'UPDATE_COMPLETE',
+        'Parameters': [{'ParameterKey': 'Size', 'ParameterValue': '1'},
+                       {'ParameterKey': 'Name', 'ParameterValue': 'bucket'}],
+        'Tags': [{'Key': 'Team', 'Value': 'a'}],
+        'Capabilities': ['CAPABILITY_IAM'],
+        'RoleARN': ROLE_ARN,
+    }
+    client.describe_stacks.return_value = {'Stacks': [stack]}
+    client.get_template.return_value = {'TemplateBody': dict(TEMPLATE)}
+    return stack
+
+
+def local(template=TEMPLATE):
+    return json.dumps(template, indent=4)
+
+
+def test_unchanged_stack(client, deployed):
+    assert changes(STACK, local(), parameters={'Name': 'bucket'}, tags={'Team': 'a'},
+                   capabilities=['CAPABILITY_IAM'], role_arn=ROLE_ARN) is None
+    client.get_template.assert_called_with(StackName=STACK, TemplateStage='Original')
+
+
+def test_unset_values_are_taken_from_deployed_stack(client, deployed):
+    assert changes(STACK, local(), parameters={'Name': 'bucket'}) is None
+
+
+def test_use_previous_parameters(client, deployed):
+    assert changes(STACK, local(), use_previous_parameters=True) is None
+    assert changes(STACK, local()) is not None
+
+
+def test_use_previous_template(client, deployed):
+    assert changes(STACK, None, parameters={'Name': 'bucket'}) is None
+    assert changes(STACK, None, parameters={'Name': 'other'}) is not None
+
+
+def test_yaml_template_is_compared(client, deployed):
+    client.get_template.return_value = {'TemplateBody': 'Parameters: {Size: {Type: Number, Default: 1}, '
+                                                        'Name: {Type: String}}\n'
+                                                        'Resources: {Bucket: {Type: "AWS::S3::Bucket", '
+                                                        'Properties: {BucketName: !Ref Name}}}'}
+    assert changes(STACK, local(), parameters={'Name': 'bucket'}) is None
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(parameters={'Name': 'other'}),
+    dict(parameters={'Name': 'bucket', 'Size': 2}),
+    dict(parameters={'Name': 'bucket'}, tags={'Team': 'b'}),
+    dict(parameters={'Name': 'bucket'}, capabilities=['CAPABILITY_NAMED_IAM']),
+    dict(parameters={'Name': 'bucket'}, role_arn='arn:aws:iam::1234:role/other'),
+])
+def test_changed_values(client, deployed, kwargs):
+    assert changes(STACK, local(), **kwargs) == 'the template, parameters, tags, capabilities or role changed'
+
+
+def test_changed_template(client, deployed):
+    template = dict(TEMPLATE, Resources={'Bucket': {'Type': 'AWS::S3::Bucket'}})
+    assert changes(STACK, local(template), parameters={'Name': 'bucket'}) is not None
+
+
+def test_stack_in_progress_is_not_skipped(client, deployed):
+    deployed['StackStatus'] = 'UPDATE_IN_PROGRESS'
+    assert changes(STACK, local(), parameters={'Name': 'bucket'}) == 'the stack is in state UPDATE_IN_PROGRESS'
+    client.get_template.assert_not_called()
+
+
+@pytest.mark.parametrize('template, reason', [
+    (dict(TEMPLATE, Transform='AWS::Serverless-2016-10-31'), 'the template uses transforms'),
+    (dict(TEMPLATE, Resources={'Nested': {'Type': 'AWS::CloudFormation::Stack'}}),
+     'the template contains nested stacks'),
+    (dict(TEMPLATE, Parameters={'Name': {'Type': 'String', 'NoEcho': True}}), 'parameter Name is NoEcho'),
+    (dict(TEMPLATE, Parameters={'Name': {'Type': 'AWS::SSM::Parameter::Value<String>'}}),
+     'parameter Name is resolved from SSM'),
+])
+def test_templates_with_unknown_changes_are_not_skipped(client, deployed, template, reason):
+    client.get_template.return_value = {'TemplateBody': template}
+    assert changes(STACK, local(template), parameters={'Name': 'bucket'}) == reason
+
+
+def test_deployed_no_echo_parameters_are_not_skipped(client, deployed):
+    deployed['Parameters'][1]['ParameterValue'] = '****'
+    assert changes(STACK, local(), parameters={'Name': 'bucket'}) == 'the deployed stack has NoEcho parameters'
+
+
+def test_stack_digest_is_canonical():
+    assert stack_digest({'a': 1, 'b': 2}, {}, {}, ['B', 'A'], None) == stack_digest({'b': 2, 'a': 1}, {}, {}, ['A', 'B'], '')
@@ -0,0 +1,81 @@
+import pytest
+
+from formica.graph import (
+    dependencies, explicit_dependencies, levels, longest_path, redundant_dependencies, resource_references,
+    topological_order
+)
+
+TEMPLATE = {
+    'Parameters': {'Name': {'Type': 'String'}},
+    'Resources': {
+        'Vpc': {'Type': 'AWS::EC2::VPC'},
+        'Subnet': {'Type': 'AWS::EC2::Subnet', 'Properties': {'VpcId': {'Ref': 'Vpc'}}},
+        'Role': {'Type': 'AWS::IAM::Role', 'Properties': {'RoleName': {'Ref': 'Name'}}},
+        'Function': {
+            'Type': 'AWS::Lambda::Function',
+            'Properties': {
+                'Role': {'Fn::GetAtt': ['Role', 'Arn']},
+                'Description': {'Fn::Sub': '${Subnet} in ${AWS::Region} ${!Literal}'},
+            },
+        },
+        'Alias': {
+            'Type': 'AWS::Lambda::Alias',
+            'DependsOn': 'Subnet',
+            'Properties': {
+                'FunctionName': {'Fn::Sub': ['${Function} ${Local}', {'Local': {'Fn::GetAtt': 'Role.Arn'}}]},
+            },
+        },
+    },
+}
+
+
+def test_dependencies_from_ref_getatt_sub_and_depends_on():
+    assert dependencies(TEMPLATE) == {
+        'Vpc': [],
+        'Subnet': ['Vpc'],
+        'Role': [],
+        'Function': ['Role', 'Subnet'],
+        'Alias': ['Function', 'Role', 'Subnet'],
+    }
+
+
+def test_resource_references_exclude_depends_on():
+    assert resource_references(TEMPLATE)['Alias'] == {'Function', 'Role'}
+
+
+def test_dependencies_of_template_without_resources():
+    assert dependencies({}) == {}
+
+
+def test_topological_order():
+    assert topological_order(dependencies(TEMPLATE)) == ['Role', 'Vpc', 'Subnet', 'Function', 'Alias']
+
+
+def test_topological_order_fails_for_cycles():
+    with pytest.raises(ValueError, match='A, B'):
+        topological_order({'A': ['B'], 'B': ['A'], 'C': []})
+
+
+def test_levels():
+    assert levels(dependencies(TEMPLATE)) == [['Role', 'Vpc'], ['Subnet'], ['Function'], ['Alias']]
+
+
+def test_longest_path():
+    assert longest_path(dependencies(TEMPLATE)) == ['Vpc', 'Subnet', 'Function', 'Alias']
+
+
+def test_longest_path_with_weights():
+    graph = {'A': [], 'B': [], 'C': ['A', 'B']}
+    assert longest_path(graph, {'A': 1, 'B': 10, 'C': 1}) == ['B', 'C']
+    assert longest_path({}) == []
+
+
+def test_redundant_dependencies():
+    template = {'Resources': {
+        'A': {'Type': 'T'},
+        'B': {'Type': 'T', 'Properties': {'Value': {'Ref': 'A'}}},
+        'C': {'Type': 'T', 'DependsOn': ['A', 'B'], 'Properties': {'Value': {'Ref': 'B'}}},
+        'D': {'Type': 'T', 'DependsOn': 'A'},
+    }}
+    assert redundant_dependencies(template) == [('C', 'A', 'B'), ('C', 'B', None)]
+    assert explicit_dependencies(template) == [('D', 'A')]
@@ -31,3 +31,54 @@ def test_with_artifacts_with_empty_artifacts(mocker):
     func(n)
     t.assert_not_called()
     function.assert_called_with(n)
+
+
+def test_lazy_variables_are_only_requested_once_used(mocker):
+    lookup = mocker.Mock(return_value={'A': 1, 'B': 2})
+    variables = helper.LazyVariables({'A': lookup, 'B': lookup})
+    assert 'A' in variables
+    assert sorted(variables) == ['A', 'B']
+    lookup.assert_not_called()
+    assert variables['A'] == 1
+    assert variables['B'] == 2
+    lookup.assert_called_once_with()
+    with pytest.raises(KeyError):
+        variables['C']
+
+
+def accounts():
+    return {'A': 1}
+
+
+def regions():
+    raise AssertionError('Lookup of unused variable')
+
+
+def test_lazy_variables_only_send_requested_values_when_pickled():
+    import pickle
+    variables = helper.LazyVariables({'A': accounts, 'B': regions})
+    assert variables['A'] == 1
+    unpickled = pickle.loads(pickle.dumps(variables))
+    assert unpickled.values == {'A': 1}
+    assert sorted(unpickled) == ['A', 'B']
+
+
+def test_organization_cache_requests_values_once_per_run(mocker):
+    lookup = mocker.Mock(return_value=['eu-central-1'])
+    cache = helper.OrganizationCache()
+    assert cache.get('regions', lookup) == ['eu-central-1']
+    assert cache.get('regions', lookup) == ['eu-central-1']
+    lookup.assert_called_once_with()
+
+
+def test_organization_cache_shares_values_between_runs(tmpdir, mocker, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+    mocker.patch('formica.helper.main_account_id', return_value='1234')
+    lookup = mocker.Mock(return_value=['eu-central-1'])
+    assert helper.OrganizationCache(ttl=60).get('regions', lookup) == ['eu-central-1']
+    assert helper.OrganizationCache(ttl=60).get('regions', lookup) == ['eu-central-1']
+    assert lookup.call_count == 1
+    assert helper.OrganizationCache(ttl=60, profile='other').get('regions', lookup) == ['eu-central-1']
+    assert lookup.call_count == 2
+    helper.OrganizationCache(ttl=60, refresh=True).get('regions', lookup)
+    assert lookup.call_count == 3
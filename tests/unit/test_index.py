@@ -0,0 +1,80 @@
+import os
+
+from path import Path
+
+from formica.index import DirectoryIndex
+
+
+def test_matches_names_case_insensitive(tmpdir):
+    with Path(tmpdir):
+        os.mkdir('ModuleDir')
+        with open('test.template.json', 'w') as f:
+            f.write('')
+        index = DirectoryIndex()
+        assert index.names('.', 'moduledir') == ['ModuleDir']
+        assert index.names('.', '*.template.JSON') == ['test.template.json']
+        assert index.names('.', '*.template.yml') == []
+
+
+def test_checks_directories(tmpdir):
+    with Path(tmpdir):
+        os.makedirs('moduledir/submodule')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('')
+        index = DirectoryIndex()
+        assert index.is_dir('./moduledir')
+        assert index.is_dir('./moduledir/submodule')
+        assert not index.is_dir('./moduledir/test.template.json')
+        assert not index.is_dir('./missing/test')
+
+
+def test_scans_every_directory_once(tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        scandir = mocker.spy(os, 'scandir')
+        index = DirectoryIndex()
+        for _ in range(3):
+            index.names('.', 'moduledir')
+            index.is_dir('./moduledir')
+    assert scandir.call_count == 1
+
+
+def create_files(*files):
+    for file in files:
+        directory = os.path.dirname(file)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(file, 'w') as f:
+            f.write('')
+
+
+def test_files_lists_all_files(tmpdir):
+    with Path(tmpdir):
+        create_files('b.txt', 'a/c.txt', 'a/b/d.txt')
+        assert DirectoryIndex().files() == ['a/b/d.txt', 'a/c.txt', 'b.txt']
+        assert DirectoryIndex().files('a/*') == ['a/b/d.txt', 'a/c.txt']
+
+
+def test_files_ignores_git_and_formica_directories(tmpdir):
+    with Path(tmpdir):
+        create_files('test.txt', '.git/HEAD', '.formica/cache/render/entry.json')
+        assert DirectoryIndex().files() == ['test.txt']
+
+
+def test_files_honours_ignore_file(tmpdir):
+    with Path(tmpdir):
+        create_files('test.txt', 'node_modules/package/index.js', 'build/output.zip', 'src/test.pyc', 'src/test.py')
+        with open('.formicaignore', 'w') as f:
+            f.write('# Dependencies\nnode_modules/\n\nbuild\n*.pyc\n.formicaignore\n')
+        assert DirectoryIndex().files() == ['src/test.py', 'test.txt']
+
+
+def test_files_walks_the_tree_once(tmpdir, mocker):
+    with Path(tmpdir):
+        create_files('a/test.txt', 'b/test.txt')
+        walk = mocker.spy(os, 'walk')
+        index = DirectoryIndex()
+        assert index.files('a/*') == ['a/test.txt']
+        assert index.files('b/*') == ['b/test.txt']
+        assert index.files('a/*') == ['a/test.txt']
+    assert walk.call_count == 1
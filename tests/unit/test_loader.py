@@ -1,10 +1,12 @@
 import json
 import os
+from collections import ChainMap
 
 import pytest
 import yaml
 from path import Path
 
+from formica import loader as loader_module
 from formica.loader import Loader
 from datetime import datetime, timedelta, timezone
 
@@ -130,6 +132,40 @@ def test_module_vars_have_precedence_over_global(tmpdir):
     assert actual == {"Description": "baz"}
 
 
+def test_module_vars_are_layered_over_global_variables(tmpdir):
+    variables = {'test': 'bar', 'other': 'global'}
+    load = Loader(variables=variables)
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Description": "{{ test }} {{ other }} {{ code(\'test.txt\', other=\'argument\') }}"}')
+        with open('moduledir/test.txt', 'w') as f:
+            f.write('{{ test }} {{ other }}')
+        with open('test.template.json', 'w') as f:
+            f.write('{"Resources": {"TestResource": {"From": "Moduledir", "Properties": {"test": "baz" } }}}')
+        load.load()
+        actual = json.loads(load.template())
+    assert actual == {"Description": "baz global baz argument"}
+    assert variables == {'test': 'bar', 'other': 'global'}
+
+
+def test_lazy_variables_are_only_requested_when_used_by_included_templates(tmpdir, mocker):
+    from formica.helper import LazyVariables
+    accounts = mocker.Mock(return_value={'AWSAccounts': ['1234']})
+    regions = mocker.Mock(return_value={'AWSRegions': ['eu-central-1']})
+    load = Loader(variables=ChainMap(LazyVariables({'AWSAccounts': accounts, 'AWSRegions': regions}), {'test': 'bar'}))
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{% set name = test %}{"Description": "{% include "partial.txt" %}"}')
+        with open('partial.txt', 'w') as f:
+            f.write('{{ name }} {{ AWSAccounts[0] }}')
+        load.load()
+        actual = json.loads(load.template())
+    assert actual == {"Description": "bar 1234"}
+    accounts.assert_called_once_with()
+    regions.assert_not_called()
+
+
 def test_supports_resouce_command(load, tmpdir):
     example = '{"Description": "{{ \'ABC%123.\' | resource }}"}'
     with Path(tmpdir):
@@ -236,6 +272,40 @@ def test_template_submodule_loads_further_modules(load, tmpdir):
     assert actual == {"Description": "Description"}
 
 
+def test_modules_with_same_variables_are_loaded_once(load, tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"Alarm{{ threshold }}": {"Type": "AWS::CloudWatch::Alarm"}}}')
+        with open('test.template.json', 'w') as f:
+            f.write(json.dumps({'Resources': {
+                'First': {'From': 'Moduledir', 'Properties': {'threshold': 1}},
+                'Second': {'From': 'Moduledir', 'Properties': {'threshold': 1}},
+                'Third': {'From': 'Moduledir', 'Properties': {'threshold': 2}}}}))
+        render = mocker.spy(Loader, 'render')
+        load.load()
+        assert render.call_count == 3
+    assert load.template_dictionary() == {'Resources': {'Alarm1': {'Type': 'AWS::CloudWatch::Alarm'},
+                                                        'Alarm2': {'Type': 'AWS::CloudWatch::Alarm'}}}
+    assert load.dependency_graph() == {'moduledir/test.template.json': [],
+                                       'test.template.json': ['moduledir/test.template.json']}
+    assert load.watched_paths() == ['.', 'moduledir', 'moduledir/test.template.json', 'test.template.json']
+
+
+def test_modules_using_module_name_are_loaded_for_every_resource(load, tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"{{ module_name }}Alarm": {"Type": "AWS::CloudWatch::Alarm"}}}')
+        with open('test.template.json', 'w') as f:
+            f.write(json.dumps({'Resources': {'First': {'From': 'Moduledir'}, 'Second': {'From': 'Moduledir'}}}))
+        render = mocker.spy(Loader, 'render')
+        load.load()
+        assert render.call_count == 3
+    assert load.template_dictionary() == {'Resources': {'FirstAlarm': {'Type': 'AWS::CloudWatch::Alarm'},
+                                                        'SecondAlarm': {'Type': 'AWS::CloudWatch::Alarm'}}}
+
+
 def test_template_fails_with_nonexistent_module(load, tmpdir):
     with Path(tmpdir):
         with open('test.template.json', 'w') as f:
@@ -573,3 +643,171 @@ def test_files_with_filter(load, tmpdir):
         load.load()
         all = json.loads(load.template())
     assert all == {"Resources": {"Test": 'moduledir1/test1.template.json,moduledir2/test2.template.json'}}
+
+
+def test_parallel_load_is_identical_to_serial_load(tmpdir):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"{{ module_name }}Bucket": {"Type": "AWS::S3::Bucket"}}}')
+        for i in range(10):
+            with open('test{}.template.yml'.format(i), 'w') as f:
+                f.write('Resources:\n  Test{0}:\n    From: Moduledir\n  Bucket{0}:\n    Type: "{{{{ test }}}}"'.format(i))
+        serial = Loader(variables={'test': 'AWS::S3::Bucket'})
+        serial.load()
+        parallel = Loader(variables={'test': 'AWS::S3::Bucket'}, jobs=4)
+        parallel.load()
+    assert parallel.template() == serial.template()
+    assert len(parallel.template_dictionary()['Resources']) == 20
+
+
+def test_parallel_load_reports_errors(tmpdir, mocker):
+    logger = mocker.patch('formica.loader.logger')
+    with Path(tmpdir):
+        with open('test1.template.json', 'w') as f:
+            f.write('{"Description": "Description"}')
+        with open('test2.template.json', 'w') as f:
+            f.write('{"Description": "{{ test }"}')
+        with pytest.raises(SystemExit):
+            Loader(jobs=2).load()
+    logger.info.assert_called_with('File: "test2.template.json", line 1')
+
+
+def test_cached_template_skips_rendering(tmpdir, mocker):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ code("test.txt") }}"}')
+        with open('test.txt', 'w') as f:
+            f.write('first')
+        Loader(cache=True).load()
+        render = mocker.spy(Loader, 'render')
+        load = Loader(cache=True)
+        load.load()
+        assert render.call_count == 0
+    assert json.loads(load.template()) == {"Description": "first"}
+
+
+def test_dependency_graph_is_recorded_for_cached_templates(tmpdir):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{% include "partial.txt" %}"}')
+        with open('partial.txt', 'w') as f:
+            f.write('first')
+        Loader(cache=True).load()
+        load = Loader(cache=True)
+        load.load()
+    assert load.dependency_graph() == {'test.template.json': ['partial.txt']}
+    assert load.dependency_files() == ['partial.txt', 'test.template.json']
+
+
+def test_cache_is_invalidated_by_changed_dependencies(tmpdir):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ code("test.txt") }}"}')
+        with open('test.txt', 'w') as f:
+            f.write('first')
+        Loader(cache=True).load()
+        with open('test.txt', 'w') as f:
+            f.write('second')
+        load = Loader(cache=True)
+        load.load()
+    assert json.loads(load.template()) == {"Description": "second"}
+
+
+def test_cache_is_keyed_by_used_variables(tmpdir):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ test }}"}')
+        Loader(variables={'test': 'first', 'unused': 'a'}, cache=True).load()
+        load = Loader(variables={'test': 'second', 'unused': 'a'}, cache=True)
+        load.load()
+        assert json.loads(load.template()) == {"Description": "second"}
+        load = Loader(variables={'test': 'first', 'unused': 'b'}, cache=True)
+        load.load()
+    assert json.loads(load.template()) == {"Description": "first"}
+
+
+def test_templates_using_now_are_not_cached(tmpdir, mocker):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ now().year }}"}')
+        Loader(cache=True).load()
+        render = mocker.spy(Loader, 'render')
+        Loader(cache=True).load()
+    assert render.call_count == 1
+
+
+def test_files_ignores_cache_directory(tmpdir):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ files() | join(",") }}"}')
+        os.makedirs('.formica/cache')
+        with open('.formica/cache/entry.json', 'w') as f:
+            f.write('')
+        load = Loader(cache=True)
+        load.load()
+    assert json.loads(load.template()) == {"Description": "test.template.json"}
+
+
+def test_module_loaders_share_the_environment(tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"{{ module_name }}": {"Type": "AWS::S3::Bucket"}}}')
+        with open('test.template.json', 'w') as f:
+            f.write(json.dumps({'Resources': {'First': {'From': 'Moduledir'}, 'Second': {'From': 'Moduledir'}}}))
+        create_environment = mocker.spy(loader_module, 'create_environment')
+        load = Loader()
+        load.load()
+    assert create_environment.call_count == 1
+    assert json.loads(load.template()) == {
+        'Resources': {'First': {'Type': 'AWS::S3::Bucket'}, 'Second': {'Type': 'AWS::S3::Bucket'}}}
+
+
+def test_compiled_templates_are_cached_in_the_user_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('user')))
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ \'test\' }}"}')
+        load = Loader(cache=True)
+        assert not os.path.exists('user/formica/jinja')
+        load.load()
+        assert os.listdir('user/formica/jinja')
+        assert os.stat('user/formica/jinja').st_mode & 0o077 == 0
+        assert not os.path.exists('.formica/cache/jinja')
+
+
+def test_json_templates_are_parsed_with_json_parser(load, tmpdir, mocker):
+    yaml_load = mocker.spy(loader_module.yaml_tags, 'load')
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Resources": {"Test": {"Type": "AWS::S3::Bucket", "Properties": {"Value": 1.5}}}}')
+        load.load()
+    yaml_load.assert_not_called()
+    assert load.template_dictionary() == {
+        'Resources': {'Test': {'Type': 'AWS::S3::Bucket', 'Properties': {'Value': 1.5}}}}
+
+
+def test_json_templates_fall_back_to_yaml(load, tmpdir, mocker):
+    yaml_load = mocker.spy(loader_module.yaml_tags, 'load')
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('Resources:\n  Test: !Ref Value')
+        load.load()
+    yaml_load.assert_called_once()
+    assert load.template_dictionary() == {'Resources': {'Test': {'Ref': 'Value'}}}
+
+
+def test_module_loaders_share_the_directory_index(tmpdir, mocker):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"{{ module_name }}": {"Type": "AWS::S3::Bucket"}}}')
+        resources = {'Module{}'.format(i): {'From': 'Moduledir'} for i in range(5)}
+        with open('test.template.json', 'w') as f:
+            f.write(json.dumps({'Resources': resources}))
+        scandir = mocker.spy(os, 'scandir')
+        load = Loader()
+        load.load()
+    assert scandir.call_count == 2
+    assert len(load.template_dictionary()['Resources']) == 5
@@ -0,0 +1,101 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from formica.polling import Poller, RateLimiter, throttled, INITIAL_DELAY, MAX_DELAY, THROTTLING_DELAY
+
+
+@pytest.fixture
+def time(mocker):
+    time = mocker.patch('formica.polling.time')
+    time.monotonic.return_value = 0
+    return time
+
+
+@pytest.fixture
+def random(mocker):
+    random = mocker.patch('formica.polling.random')
+    random.uniform.side_effect = lambda low, high: high
+    return random
+
+
+def throttling_error():
+    return ClientError(dict(Error=dict(Code='Throttling')), 'DescribeStackEvents')
+
+
+def test_sleep_backs_off_until_max_delay(time, random):
+    poller = Poller()
+    for _ in range(20):
+        poller.sleep()
+    delays = [c[0][0] for c in time.sleep.call_args_list]
+    assert delays[0] == INITIAL_DELAY
+    assert delays[1] == INITIAL_DELAY * 1.5
+    assert delays == sorted(delays)
+    assert delays[-1] == MAX_DELAY
+
+
+def test_sleep_adds_jitter(time, random):
+    Poller(initial_delay=4).sleep()
+    random.uniform.assert_called_with(2, 4)
+
+
+def test_expires_after_timeout(time):
+    poller = Poller(timeout=10)
+    time.monotonic.return_value = 10
+    assert not poller.expired()
+    time.monotonic.return_value = 11
+    assert poller.expired()
+
+
+def test_never_expires_without_timeout(time):
+    poller = Poller()
+    time.monotonic.return_value = 100000
+    assert not poller.expired()
+
+
+def test_call_returns_result(mocker, time):
+    function = mocker.Mock(return_value='result')
+    assert Poller().call(function, StackName='stack') == 'result'
+    function.assert_called_once_with(StackName='stack')
+    time.sleep.assert_not_called()
+
+
+def test_call_retries_throttled_requests(mocker, time, random):
+    function = mocker.Mock(side_effect=[throttling_error(), throttling_error(), 'result'])
+    poller = Poller()
+    assert poller.call(function) == 'result'
+    assert function.call_count == 3
+    assert [c[0][0] for c in time.sleep.call_args_list] == [THROTTLING_DELAY, THROTTLING_DELAY * 2]
+    assert poller.delay == MAX_DELAY
+
+
+def test_call_raises_other_errors(mocker, time):
+    error = ClientError(dict(Error=dict(Code='ValidationError')), 'DescribeStackEvents')
+    function = mocker.Mock(side_effect=error)
+    with pytest.raises(ClientError):
+        Poller().call(function)
+    time.sleep.assert_not_called()
+
+
+def test_throttled():
+    assert throttled(throttling_error())
+    assert not throttled(ClientError(dict(Error=dict(Code='ValidationError')), 'DescribeStackEvents'))
+    assert not throttled(ValueError())
+
+
+def test_rate_limiter_spaces_out_calls(time):
+    limiter = RateLimiter(4)
+    time.monotonic.return_value = 10
+    limiter.acquire()
+    time.sleep.assert_not_called()
+    limiter.acquire()
+    limiter.acquire()
+    assert [c[0][0] for c in time.sleep.call_args_list] == [0.25, 0.5]
+
+
+def test_rate_limiter_does_not_wait_after_pause(time):
+    limiter = RateLimiter(4)
+    time.monotonic.return_value = 10
+    limiter.acquire()
+    time.monotonic.return_value = 11
+    limiter.acquire()
+    time.sleep.assert_not_called()
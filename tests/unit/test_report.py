@@ -0,0 +1,139 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from formica import cli
+from formica.report import critical_path, duration_events, operation_events, resource_timings
+from tests.unit.constants import STACK, STACK_ID, EVENT_ID
+
+START = datetime(2024, 1, 1, 10, 0, 0)
+
+TEMPLATE = {
+    'Resources': {
+        'Vpc': {'Type': 'AWS::EC2::VPC'},
+        'Subnet': {'Type': 'AWS::EC2::Subnet', 'Properties': {'VpcId': {'Ref': 'Vpc'}}},
+        'Bucket': {'Type': 'AWS::S3::Bucket'},
+    }
+}
+
+
+@pytest.fixture
+def logger(mocker):
+    return mocker.patch('formica.report.logger')
+
+
+def event(name, status, seconds, type='AWS::EC2::VPC'):
+    physical_id = STACK_ID if name == STACK else name + '-id'
+    return {'EventId': '{}-{}'.format(name, status), 'StackId': STACK_ID, 'PhysicalResourceId': physical_id,
+            'LogicalResourceId': name, 'ResourceType': type, 'ResourceStatus': status,
+            'Timestamp': START + timedelta(seconds=seconds)}
+
+
+# Oldest first
+EVENTS = [
+    event(STACK, 'UPDATE_IN_PROGRESS', 0, 'AWS::CloudFormation::Stack'),
+    event('Vpc', 'UPDATE_IN_PROGRESS', 10),
+    event('Bucket', 'UPDATE_IN_PROGRESS', 10, 'AWS::S3::Bucket'),
+    event('Vpc', 'UPDATE_COMPLETE', 70),
+    event('Subnet', 'UPDATE_IN_PROGRESS', 75, 'AWS::EC2::Subnet'),
+    event('Bucket', 'UPDATE_COMPLETE', 100, 'AWS::S3::Bucket'),
+    event('Subnet', 'UPDATE_COMPLETE', 135, 'AWS::EC2::Subnet'),
+    event(STACK, 'UPDATE_COMPLETE', 140, 'AWS::CloudFormation::Stack'),
+]
+
+
+def set_events(client, events):
+    previous = [event(STACK, 'CREATE_COMPLETE', -100, 'AWS::CloudFormation::Stack'),
+                event('Vpc', 'CREATE_COMPLETE', -110)]
+    newest_first = list(reversed(events)) + previous
+    client.get_paginator.return_value.paginate.return_value = [
+        {'StackEvents': newest_first[:4]}, {'StackEvents': newest_first[4:]}]
+
+
+def test_operation_events_stop_at_operation_start(client):
+    set_events(client, EVENTS)
+    assert operation_events(STACK) == EVENTS
+    client.get_paginator.assert_called_with('describe_stack_events')
+    client.get_paginator.return_value.paginate.assert_called_with(StackName=STACK)
+
+
+def test_duration_events_stop_once_every_resource_has_a_duration(client):
+    previous = [event('Vpc', 'CREATE_COMPLETE', -110), event('Vpc', 'CREATE_IN_PROGRESS', -120)]
+    newest_first = list(reversed(EVENTS))
+    client.get_paginator.return_value.paginate.return_value = [
+        {'StackEvents': newest_first[:6]}, {'StackEvents': newest_first[6:]}, {'StackEvents': previous}]
+    assert duration_events(STACK, ['Bucket', 'Subnet']) == EVENTS[2:]
+    assert duration_events(STACK, ['Bucket', 'Subnet', 'Vpc']) == EVENTS
+    assert duration_events(STACK, ['Missing']) == list(reversed(previous)) + EVENTS
+
+
+def test_duration_events_stop_after_operations(client):
+    set_events(client, EVENTS)
+    assert duration_events(STACK, ['Missing'], operations=1) == EVENTS
+
+
+def test_resource_timings():
+    timings = resource_timings(EVENTS)
+    assert sorted(timings) == ['Bucket', 'Subnet', 'Vpc']
+    assert timings['Vpc']['duration'] == timedelta(seconds=60)
+    assert timings['Bucket']['duration'] == timedelta(seconds=90)
+    assert timings['Subnet']['status'] == 'UPDATE_COMPLETE'
+    assert timings['Subnet']['type'] == 'AWS::EC2::Subnet'
+
+
+def test_resource_timings_add_up_rollbacks():
+    timings = resource_timings([
+        event('Vpc', 'UPDATE_IN_PROGRESS', 0),
+        event('Vpc', 'UPDATE_FAILED', 30),
+        event('Vpc', 'UPDATE_IN_PROGRESS', 40),
+        event('Vpc', 'UPDATE_COMPLETE', 50),
+    ])
+    assert timings['Vpc']['duration'] == timedelta(seconds=40)
+    assert timings['Vpc']['end'] == START + timedelta(seconds=50)
+
+
+def test_critical_path_follows_dependencies():
+    assert critical_path(TEMPLATE, resource_timings(EVENTS)) == ['Vpc', 'Subnet']
+
+
+def test_report_command(client, logger):
+    set_events(client, EVENTS)
+    client.get_template.return_value = {'TemplateBody': json.dumps(TEMPLATE)}
+    cli.main(['report', '--stack', STACK, '--top', '2'])
+    output = '\n'.join([call[1][0] for call in logger.info.mock_calls if isinstance(call[1][0], str)])
+    client.get_template.assert_called_with(StackName=STACK)
+    assert 'took 0:02:20, 3 resources changed' in output
+    slowest = output.split('Slowest resources:')[1].split('Critical path')[0]
+    assert 'Bucket' in slowest and 'Vpc' in slowest and 'Subnet' not in slowest
+    critical = output.split('Critical path')[1]
+    assert 'Vpc' in critical and 'Subnet' in critical and 'Bucket' not in critical
+    assert '0:02:00' in critical
+
+
+def test_report_without_changes(client, logger):
+    set_events(client, [EVENTS[0], EVENTS[-1]])
+    cli.main(['report', '--stack', STACK])
+    logger.info.assert_called_with('No resources were changed in the last operation of stack {}'.format(STACK))
+    client.get_template.assert_not_called()
+
+
+def test_deploy_prints_report(client, stack_waiter, mocker):
+    print_report = mocker.patch('formica.report.print_report')
+    client.describe_change_set.return_value = {'Status': 'CREATE_COMPLETE'}
+    client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    cli.main(['deploy', '--stack', STACK, '--report'])
+    print_report.assert_called_with(STACK)
+
+
+def test_deploy_prints_report_for_failed_deployments(client, stack_waiter, mocker):
+    print_report = mocker.patch('formica.report.print_report')
+    stack_waiter.return_value.wait.side_effect = SystemExit(1)
+    client.describe_change_set.return_value = {'Status': 'CREATE_COMPLETE'}
+    client.describe_stack_events.return_value = {'StackEvents': [{'EventId': EVENT_ID}]}
+    client.describe_stacks.return_value = {'Stacks': [{'StackId': STACK_ID}]}
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        cli.main(['deploy', '--stack', STACK, '--report'])
+    assert pytest_wrapped_e.value.code == 1
+    print_report.assert_called_with(STACK)
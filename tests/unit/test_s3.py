@@ -84,3 +84,15 @@ def test_does_not_use_s3_api_when_planning(bucket):
     bucket.return_value.create.assert_not_called()
     bucket.return_value.put_object.assert_not_called()
     bucket.return_value.delete_objects.assert_not_called()
+
+
+def test_bucket_name_is_computed_once_per_content(boto_client):
+    boto_client.return_value.meta.region_name = "eu-central-1"
+    boto_client.return_value.get_caller_identity.return_value = {'Account': '1234'}
+    with temporary_bucket(seed=STACK) as temp_bucket:
+        temp_bucket.add(STRING_BODY)
+        first = temp_bucket.name
+        assert temp_bucket.name is first
+        temp_bucket.add(BINARY_BODY)
+        assert temp_bucket.name != first
+    boto_client.return_value.get_caller_identity.assert_called_once_with()
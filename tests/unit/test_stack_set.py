@@ -56,7 +56,7 @@ def input(mocker):
 
 @pytest.fixture
 def time(mocker):
-    return mocker.patch('formica.stack_set.time')
+    return mocker.patch('formica.polling.time')
 
 
 @pytest.fixture
@@ -133,7 +133,8 @@ def test_create_stack_set_with_main_account(boto_client, client, logger, tmpdir)
             '--main-account-parameter'
         ])
 
-    boto_client.assert_called_with('sts')
+    boto_client.assert_any_call('sts')
+    client.get_caller_identity.assert_called()
 
     client.create_stack_set.assert_called_with(
         StackSetName=STACK,
@@ -516,6 +517,29 @@ def test_remove_all_stack_set_instances(client, loader, wait, input):
     )
 
 
+def test_stack_set_instances_use_organization_cache(client, loader, wait, input, tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+    client.get_caller_identity.return_value = {'Account': '5678'}
+    client.describe_regions.return_value = EC2_REGIONS
+    for _ in range(2):
+        cli.main([
+            'stack-set',
+            'remove-instances',
+            '--stack-set', STACK,
+            '--all-accounts',
+            '--all-regions',
+            '--org-cache-ttl', '60',
+        ])
+
+    client.describe_regions.assert_called_once()
+    client.delete_stack_instances.assert_called_with(
+        StackSetName=STACK,
+        Accounts=['1234', '5678'],
+        Regions=['us-west-1', 'us-west-2'],
+        RetainStacks=False
+    )
+
+
 def test_remove_stack_set(client, loader):
     cli.main([
         'stack-set',
@@ -576,14 +600,15 @@ def test_main_account_only_deployment_with_preference(client, logger, loader, co
 def test_diff_cli_call(template, mocker, client, session):
     diff = mocker.patch('formica.diff.compare_stack_set')
     cli.main(['stack-set', 'diff', '--stack-set', STACK, '--main-account-parameter'])
-    diff.assert_called_with(stack=STACK, parameters={}, vars={}, tags={}, main_account_parameter=True)
+    diff.assert_called_with(stack=STACK, parameters={}, vars={}, tags={}, main_account_parameter=True,
+                            loader_options={'jobs': 1, 'cache': True})
 
 
 def test_diff_cli_call_with_vars(template, mocker, client, session):
     diff = mocker.patch('formica.diff.compare_stack_set')
     cli.main(['stack-set', 'diff', '--stack', STACK, '--vars', 'V=1', '--parameters', 'P=2', '--tags', 'T=3'])
     diff.assert_called_with(stack=STACK, vars={'V': '1'}, parameters={'P': '2'}, tags={'T': '3'},
-                            main_account_parameter=False)
+                            main_account_parameter=False, loader_options={'jobs': 1, 'cache': True})
 
 
 def test_stack_set_waiter(client, loader, compare, time):
@@ -602,8 +627,8 @@ def test_stack_set_waiter(client, loader, compare, time):
         TemplateBody=TEMPLATE
     )
 
-    time.sleep.assert_called_with(5)
     assert time.sleep.call_count == 2
+    assert 0.75 <= time.sleep.call_args[0][0] <= 1.5
 
 
 def test_stack_set_waiter_exits_on_failed_operation(client, loader, input, compare, time):
@@ -623,5 +648,5 @@ def test_stack_set_waiter_exits_on_failed_operation(client, loader, input, compa
         TemplateBody=TEMPLATE
     )
 
-    time.sleep.assert_called_with(5)
     assert time.sleep.call_count == 2
+    assert 0.75 <= time.sleep.call_args[0][0] <= 1.5
@@ -1,14 +1,16 @@
+import json
 import pytest
-from mock import Mock
+from mock import Mock, call
 from datetime import datetime, timedelta
 
+from formica import stack_waiter as stack_waiter_module
 from formica.stack_waiter import StackWaiter, EVENT_TABLE_HEADERS
-from tests.unit.constants import STACK, STACK_EVENTS
+from tests.unit.constants import STACK, STACK_EVENTS, STACK_ID
 
 
 @pytest.fixture
 def time(mocker):
-    return mocker.patch('formica.stack_waiter.time')
+    return mocker.patch('formica.polling.time')
 
 
 @pytest.fixture
@@ -30,9 +32,19 @@ def client(mocker):
     client = mocker.patch('formica.stack_waiter.cf')
     return client
 
+def stack_event(event_id, status):
+    return {'EventId': event_id, 'StackId': STACK_ID, 'PhysicalResourceId': STACK_ID, 'LogicalResourceId': STACK,
+            'ResourceType': 'AWS::CloudFormation::Stack', 'ResourceStatus': status, 'Timestamp': datetime.now()}
+
+
 def set_stack_status_returns(client, statuses):
-    client.describe_stacks.side_effect = [{'Stacks': [{'StackStatus': status}]} for status in
-                                                  statuses]
+    pages = []
+    events = [{'EventId': '0'}]
+    for num, status in enumerate(statuses, 1):
+        events = [stack_event(str(num), status)] + events
+        pages.append({'StackEvents': events})
+    client.describe_stack_events.side_effect = pages
+    client.describe_stacks.return_value = {'Stacks': [{'StackStatus': 'UPDATE_IN_PROGRESS'}]}
 
 
 def set_stack_events(client, events=1):
@@ -42,7 +54,6 @@ def set_stack_events(client, events=1):
 
 def test_prints_header(time, mocker, client, stack_waiter):
     header = mocker.patch.object(StackWaiter, 'print_header')
-    set_stack_status_returns(client, ['CREATE_COMPLETE'])
     client.describe_stack_events.return_value = STACK_EVENTS
     stack_waiter.wait('DeploymentBucket3-7c92066b-c2e7-427a-ab29-53b928925473')
     header.assert_called()
@@ -50,15 +61,13 @@ def test_prints_header(time, mocker, client, stack_waiter):
 
 def test_waits_until_successful(client, time, stack_waiter):
     set_stack_status_returns(client, ['UPDATE_IN_PROGRESS', 'CREATE_COMPLETE'])
-    set_stack_events(client)
     stack_waiter.wait('0')
     assert time.sleep.call_count == 1
-    time.sleep.assert_called_with(5)
+    assert 0.5 <= time.sleep.call_args[0][0] <= 1
 
 
 def test_waits_until_failed_and_raises(client, time, stack_waiter):
     set_stack_status_returns(client, ['UPDATE_IN_PROGRESS', 'CREATE_FAILED'])
-    set_stack_events(client)
     with pytest.raises(SystemExit, match='1'):
         stack_waiter.wait('0')
     assert time.sleep.call_count == 1
@@ -71,7 +80,6 @@ def test_waits_until_timeout(client, time, datetime_mock):
     datetime_mock.now.side_effect = [first_timestamp, second_timestamp, last_timestamp]
     set_stack_status_returns(client,
                              ['UPDATE_IN_PROGRESS', 'UPDATE_IN_PROGRESS', 'UPDATE_IN_PROGRESS', 'CREATE_FAILED'])
-    set_stack_events(client)
     stack_waiter = StackWaiter(STACK, timeout=1)
     with pytest.raises(SystemExit, match='1'):
         stack_waiter.wait('0')
@@ -80,7 +88,6 @@ def test_waits_until_timeout(client, time, datetime_mock):
 
 
 def test_prints_new_events(logger, time, client, stack_waiter):
-    set_stack_status_returns(client, ['CREATE_COMPLETE'])
     client.describe_stack_events.return_value = STACK_EVENTS
     stack_waiter.wait('DeploymentBucket3-7c92066b-c2e7-427a-ab29-53b928925473')
 
@@ -100,3 +107,144 @@ def test_prints_new_events(logger, time, client, stack_waiter):
     for term in old_events:
         assert term not in output
     assert 'None' not in output
+
+
+def test_takes_stack_status_from_stack_events(client, time, stack_waiter):
+    set_stack_status_returns(client, ['UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE'])
+    stack_waiter.wait('0')
+    client.describe_stacks.assert_not_called()
+
+
+def test_requests_stack_status_once_until_stack_events_arrive(client, time, stack_waiter):
+    client.describe_stack_events.side_effect = [
+        {'StackEvents': [{'EventId': '0'}]},
+        {'StackEvents': [{'EventId': '0'}]},
+        {'StackEvents': [stack_event('1', 'UPDATE_COMPLETE'), {'EventId': '0'}]},
+    ]
+    client.describe_stacks.return_value = {'Stacks': [{'StackStatus': 'UPDATE_IN_PROGRESS'}]}
+    stack_waiter.wait('0')
+    client.describe_stacks.assert_called_once_with(StackName=STACK)
+    assert time.sleep.call_count == 2
+
+
+def test_finishes_with_stack_status_without_new_events(client, time, stack_waiter):
+    set_stack_events(client)
+    client.describe_stacks.return_value = {'Stacks': [{'StackStatus': 'UPDATE_COMPLETE'}]}
+    stack_waiter.wait('0')
+    time.sleep.assert_not_called()
+
+
+def test_pages_back_to_the_last_seen_event(logger, client, time, stack_waiter):
+    client.describe_stack_events.side_effect = [
+        {'StackEvents': [stack_event('3', 'UPDATE_COMPLETE'), stack_event('2', 'UPDATE_IN_PROGRESS')],
+         'NextToken': 'token'},
+        {'StackEvents': [stack_event('1', 'UPDATE_IN_PROGRESS'), {'EventId': '0'}], 'NextToken': 'older'},
+    ]
+    stack_waiter.wait('0')
+    assert client.describe_stack_events.call_args_list == [
+        call(StackName=STACK), call(StackName=STACK, NextToken='token')]
+
+
+def test_prints_stack_name_column(logger, client, time):
+    set_stack_status_returns(client, ['UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE'])
+    StackWaiter(STACK_ID, name='other-stack').wait('0')
+    output = '\n'.join([call[1][0] for call in logger.info.mock_calls])
+    assert 'Stack' in output.splitlines()[1]
+    assert output.count('other-stack') == 3
+    logger.info.assert_called_with('other-stack: Stack Status Successful: UPDATE_COMPLETE')
+
+
+def test_follows_nested_stack_events(logger, client, time):
+    time.monotonic.return_value = 0
+    nested_id = 'arn:aws:cloudformation:eu-central-1:1234:stack/teststack-Nested-1/uuid'
+    since = datetime(2024, 1, 1, 10, 0, 0)
+    nested_resource = {'EventId': '2', 'StackId': STACK_ID, 'PhysicalResourceId': nested_id,
+                       'LogicalResourceId': 'Nested', 'ResourceType': 'AWS::CloudFormation::Stack',
+                       'ResourceStatus': 'UPDATE_IN_PROGRESS', 'Timestamp': since}
+    parent_pages = [
+        {'StackEvents': [nested_resource, stack_event('1', 'UPDATE_IN_PROGRESS'), {'EventId': '0'}]},
+        {'StackEvents': [stack_event('3', 'UPDATE_COMPLETE'), nested_resource]},
+    ]
+    nested_events = {'StackEvents': [
+        {'EventId': 'n2', 'StackId': nested_id, 'PhysicalResourceId': 'bucket', 'LogicalResourceId': 'NestedBucket',
+         'ResourceType': 'AWS::S3::Bucket', 'ResourceStatus': 'UPDATE_COMPLETE', 'Timestamp': since},
+        {'EventId': 'n1', 'StackId': nested_id, 'PhysicalResourceId': 'bucket', 'LogicalResourceId': 'OldBucket',
+         'ResourceType': 'AWS::S3::Bucket', 'ResourceStatus': 'CREATE_COMPLETE',
+         'Timestamp': since - timedelta(days=1)},
+    ]}
+
+    def describe_stack_events(StackName):
+        return nested_events if StackName == nested_id else parent_pages.pop(0)
+
+    client.describe_stack_events.side_effect = describe_stack_events
+    StackWaiter(STACK_ID, nested=True).wait('0')
+
+    output = '\n'.join([call[1][0] for call in logger.info.mock_calls])
+    assert STACK_ID + '/Nested' in output
+    assert 'NestedBucket' in output
+    assert output.count('NestedBucket') == 1
+    assert 'OldBucket' not in output
+    client.describe_stack_events.assert_any_call(StackName=nested_id)
+
+
+def test_stops_following_finished_nested_stacks(logger, client, time, mocker):
+    executor = mocker.spy(stack_waiter_module, 'ThreadPoolExecutor')
+    time.monotonic.return_value = 0
+    nested_id = 'arn:aws:cloudformation:eu-central-1:1234:stack/teststack-Nested-1/uuid'
+    since = datetime(2024, 1, 1, 10, 0, 0)
+
+    def nested_resource(event_id, status):
+        return {'EventId': event_id, 'StackId': STACK_ID, 'PhysicalResourceId': nested_id,
+                'LogicalResourceId': 'Nested', 'ResourceType': 'AWS::CloudFormation::Stack',
+                'ResourceStatus': status, 'Timestamp': since}
+
+    parent_pages = [
+        {'StackEvents': [nested_resource('2', 'UPDATE_IN_PROGRESS'), stack_event('1', 'UPDATE_IN_PROGRESS'),
+                         {'EventId': '0'}]},
+        {'StackEvents': [nested_resource('3', 'UPDATE_COMPLETE'), nested_resource('2', 'UPDATE_IN_PROGRESS')]},
+        {'StackEvents': [nested_resource('3', 'UPDATE_COMPLETE')]},
+        {'StackEvents': [stack_event('4', 'UPDATE_COMPLETE'), nested_resource('3', 'UPDATE_COMPLETE')]},
+    ]
+    nested_events = {'StackEvents': [
+        {'EventId': 'n2', 'StackId': nested_id, 'PhysicalResourceId': nested_id, 'LogicalResourceId': 'Nested',
+         'ResourceType': 'AWS::CloudFormation::Stack', 'ResourceStatus': 'UPDATE_COMPLETE', 'Timestamp': since},
+        {'EventId': 'n1', 'StackId': nested_id, 'PhysicalResourceId': 'bucket', 'LogicalResourceId': 'NestedBucket',
+         'ResourceType': 'AWS::S3::Bucket', 'ResourceStatus': 'UPDATE_COMPLETE', 'Timestamp': since},
+    ]}
+
+    def describe_stack_events(StackName):
+        return nested_events if StackName == nested_id else parent_pages.pop(0)
+
+    client.describe_stack_events.side_effect = describe_stack_events
+    StackWaiter(STACK_ID, nested=True).wait('0')
+
+    assert not parent_pages
+    assert client.describe_stack_events.call_args_list.count(call(StackName=nested_id)) == 1
+    assert executor.call_count == 1
+
+
+def test_does_not_follow_nested_stacks_by_default(client, time, stack_waiter):
+    nested_resource = {'EventId': '2', 'StackId': STACK_ID, 'PhysicalResourceId': 'nested-id',
+                       'LogicalResourceId': 'Nested', 'ResourceType': 'AWS::CloudFormation::Stack',
+                       'ResourceStatus': 'UPDATE_COMPLETE', 'Timestamp': datetime.now()}
+    client.describe_stack_events.return_value = {
+        'StackEvents': [stack_event('3', 'UPDATE_COMPLETE'), nested_resource, {'EventId': '0'}]}
+    stack_waiter.wait('0')
+    client.describe_stack_events.assert_called_once_with(StackName=STACK)
+
+
+def test_labels_events_with_stack_name_of_stack_id():
+    assert StackWaiter('arn:aws:cloudformation:eu-central-1:1234:stack/teststack/uuid').label() == 'teststack'
+    assert StackWaiter(STACK, name='other-stack').label() == 'other-stack'
+
+
+def test_writes_events_as_ndjson(logger, client, time, capsys):
+    set_stack_status_returns(client, ['UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE'])
+    StackWaiter(STACK_ID, output='ndjson').wait('0')
+    lines = capsys.readouterr().out.splitlines()
+    events = [json.loads(line) for line in lines]
+    assert [e['ResourceStatus'] for e in events] == ['UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE']
+    assert [e['EventId'] for e in events] == ['1', '2']
+    assert all(e['Stack'] == STACK_ID for e in events)
+    assert datetime.strptime(events[0]['Timestamp'][:19], '%Y-%m-%dT%H:%M:%S')
+    logger.info.assert_called_once_with('Stack Status Successful: UPDATE_COMPLETE')
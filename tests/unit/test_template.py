@@ -5,6 +5,7 @@ import pytest
 from path import Path
 
 from formica import cli
+from formica.loader import Loader
 from .constants import ACCOUNTS, EC2_REGIONS
 
 
@@ -148,3 +149,151 @@ def test_with_artifacts(aws_client, tmpdir, logger, paginators):
         actual = yaml.safe_load(output)
         expected = {"Resources": {"Bucket": "formica-deploy-83acc03037c35fdce1aae77faa87d9f2", "Key": "864c71d530a42421476458005e05b2a0" }}
     assert actual == expected
+
+
+def test_template_with_parallel_jobs(tmpdir, logger):
+    with Path(tmpdir):
+        for i in range(3):
+            with open('test{}.template.json'.format(i), 'w') as f:
+                f.write('{"Resources": {"Bucket%s": {"Type": "AWS::S3::Bucket"}}}' % i)
+        cli.main(['template', '--jobs', '2'])
+        logger.info.assert_called()
+        actual = json.loads(logger.info.call_args[0][0])
+    assert actual == {'Resources': {'Bucket0': {'Type': 'AWS::S3::Bucket'}, 'Bucket1': {'Type': 'AWS::S3::Bucket'},
+                                    'Bucket2': {'Type': 'AWS::S3::Bucket'}}}
+
+
+def test_template_with_jobs_from_config_file(tmpdir, logger, mocker):
+    init = mocker.spy(Loader, '__init__')
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "Test"}')
+        with open('stack.config.yaml', 'w') as f:
+            f.write('jobs: 4')
+        cli.main(['template', '-c', 'stack.config.yaml'])
+        assert init.call_args[1]['jobs'] == 4
+        cli.main(['template'])
+        assert init.call_args[1]['jobs'] == 1
+
+
+def test_template_streams_to_output_file(tmpdir, logger):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ \'test\' | title }}"}')
+        cli.main(['template', '--output', 'output.json'])
+        with open('output.json') as f:
+            assert json.load(f) == {"Description": "Test"}
+        cli.main(['template', '--yaml', '--output', 'output.yaml'])
+        with open('output.yaml') as f:
+            assert yaml.safe_load(f) == {"Description": "Test"}
+        assert not [f for f in os.listdir('.') if f.endswith('.tmp')]
+
+
+def test_template_does_not_rewrite_unchanged_output_file(tmpdir, logger):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "Test"}')
+        cli.main(['template', '--output', 'output.json'])
+        os.utime('output.json', (0, 0))
+        cli.main(['template', '--output', 'output.json'])
+        assert os.stat('output.json').st_mtime == 0
+        logger.info.assert_called_with('Template in output.json is unchanged')
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "Changed"}')
+        cli.main(['template', '--output', 'output.json'])
+        assert os.stat('output.json').st_mtime != 0
+
+
+def test_template_streams_to_stdout(tmpdir, logger, capsys):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "Test"}')
+        cli.main(['template', '--output', '-'])
+    out, err = capsys.readouterr()
+    assert json.loads(out) == {"Description": "Test"}
+    logger.info.assert_not_called()
+
+
+def test_template_prints_json_dependencies(tmpdir, logger):
+    with Path(tmpdir):
+        os.mkdir('moduledir')
+        with open('moduledir/test.template.json', 'w') as f:
+            f.write('{"Resources": {"Bucket": {"Type": "{{ file(\'type.txt\') }}"}}}')
+        with open('moduledir/type.txt', 'w') as f:
+            f.write('AWS::S3::Bucket')
+        with open('test.template.json', 'w') as f:
+            f.write('{"Resources": {"Module": {"From": "Moduledir"}}}')
+        cli.main(['template', '--deps', 'json'])
+        deps = json.loads(logger.info.call_args[0][0])
+        assert deps['target'] == 'template'
+        assert deps['files'] == ['moduledir/test.template.json', 'moduledir/type.txt', 'test.template.json']
+        assert deps['dependencies'] == {
+            'moduledir/test.template.json': ['moduledir/type.txt'],
+            'test.template.json': ['moduledir/test.template.json']
+        }
+
+
+def test_template_prints_make_dependencies_for_output_file(tmpdir, logger):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ code(\'my script.py\') }}"}')
+        with open('my script.py', 'w') as f:
+            f.write('test')
+        cli.main(['template', '--output', 'stack.json', '--deps', 'make'])
+        # Unchanged output is touched, so it stays newer than its dependencies
+        os.utime('stack.json', (0, 0))
+        cli.main(['template', '--output', 'stack.json', '--deps', 'make'])
+        assert os.path.getmtime('stack.json') >= os.path.getmtime('test.template.json')
+        assert logger.info.call_count == 2
+        assert logger.info.call_args[0][0] == (
+            'stack.json: \\\n    my\\ script.py \\\n    test.template.json\n\nmy\\ script.py:\n\n'
+            'test.template.json:'
+        )
+        with open('stack.json') as f:
+            assert json.load(f) == {"Description": "test"}
+
+
+def test_template_deps_fails_with_stdout_output(tmpdir, logger):
+    with Path(tmpdir):
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            cli.main(['template', '--output', '-', '--deps', 'make'])
+        assert pytest_wrapped_e.value.code == 1
+
+
+def test_template_dependencies_include_config_files(tmpdir, logger):
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{{ test }}"}')
+        with open('stack.config.yaml', 'w') as f:
+            f.write('vars:\n  test: value')
+        cli.main(['template', '-c', 'stack.config.yaml', '--deps', 'json'])
+        deps = json.loads(logger.info.call_args[0][0])
+        assert deps['files'] == ['stack.config.yaml', 'test.template.json']
+
+
+def test_template_watch_renders_with_shared_environment(tmpdir, logger, mocker):
+    watch = mocker.patch('formica.watch.watch')
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Description": "{% include "partial.txt" %}"}')
+        with open('partial.txt', 'w') as f:
+            f.write('test')
+        cli.main(['template', '--watch'])
+        run = watch.call_args[0][0]
+        assert run() == ['.', 'partial.txt', 'test.template.json']
+        assert run() == ['.', 'partial.txt', 'test.template.json']
+    assert json.loads(logger.info.call_args[0][0]) == {"Description": "test"}
+
+
+def test_organization_variables_are_only_requested_when_used(aws_client, tmpdir, logger, paginators):
+    aws_client.get_paginator.side_effect = paginators(list_accounts=[ACCOUNTS])
+    aws_client.describe_regions.return_value = EC2_REGIONS
+    aws_client.get_caller_identity.return_value = {'Account': '1234'}
+    with Path(tmpdir):
+        with open('test.template.json', 'w') as f:
+            f.write('{"Resources": {"Regions": {{ AWSRegions | tojson }}}}')
+        cli.main(['template', '--organization-variables'])
+    aws_client.describe_regions.assert_called_once()
+    aws_client.get_paginator.assert_not_called()
+    aws_client.get_caller_identity.assert_not_called()
+    assert json.loads(logger.info.call_args[0][0]) == {'Resources': {'Regions': ['us-west-1', 'us-west-2']}}
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+from path import Path
+
+from formica import watch
+
+
+# Not an Exception, as watch logs those and keeps running
+class Stop(BaseException):
+    pass
+
+
+def test_snapshot_records_missing_files(tmpdir):
+    with Path(tmpdir):
+        with open('test.txt', 'w') as f:
+            f.write('test')
+        os.utime('test.txt', ns=(1, 1))
+        assert watch.snapshot(['test.txt', 'missing.txt']) == {'test.txt': 1, 'missing.txt': None}
+
+
+def test_watch_runs_again_once_a_file_changed(tmpdir, mocker):
+    runs = []
+
+    def run():
+        runs.append(len(runs))
+        if len(runs) == 2:
+            raise Stop()
+        return ['test.txt']
+
+    sleep = mocker.patch('formica.watch.time.sleep')
+    sleep.side_effect = lambda _: os.utime('test.txt', ns=(2, 2)) if sleep.call_count == 3 else None
+    with Path(tmpdir):
+        with open('test.txt', 'w') as f:
+            f.write('test')
+        os.utime('test.txt', ns=(1, 1))
+        with pytest.raises(Stop):
+            watch.watch(run)
+    assert runs == [0, 1]
+    assert sleep.call_count == 3
+
+
+def test_watch_runs_again_after_errors(tmpdir, mocker):
+    runs = []
+
+    def run():
+        runs.append(len(runs))
+        if len(runs) == 2:
+            raise Stop()
+        raise SystemExit(1)
+
+    mocker.patch('formica.watch.time.sleep', side_effect=lambda _: os.utime('test.txt', ns=(2, 2)))
+    with Path(tmpdir):
+        with open('test.txt', 'w') as f:
+            f.write('test')
+        os.utime('test.txt', ns=(1, 1))
+        with pytest.raises(Stop):
+            watch.watch(run)
+    assert runs == [0, 1]
+
+
+def test_watch_keeps_running_after_errors_and_watches_template_directory(tmpdir, mocker):
+    logger = mocker.patch('formica.watch.logger')
+    snapshot = mocker.spy(watch, 'snapshot')
+    runs = []
+
+    def run():
+        runs.append(len(runs))
+        if len(runs) == 1:
+            return ['test.txt']
+        if len(runs) == 2:
+            raise RuntimeError('Throttling')
+        raise Stop()
+
+    mocker.patch('formica.watch.time.sleep', side_effect=lambda _: os.utime('test.txt', ns=(len(runs) + 1,) * 2))
+    with Path(tmpdir):
+        os.makedirs('moduledir/nested')
+        for name in ['test.txt', 'test.template.json', 'moduledir/nested/other.txt', '.hidden']:
+            with open(name, 'w') as f:
+                f.write('test')
+        os.utime('test.txt', ns=(1, 1))
+        with pytest.raises(Stop):
+            watch.watch(run)
+    assert runs == [0, 1, 2]
+    logger.info.assert_any_call(mocker.ANY)
+    assert str(logger.info.call_args_list[1][0][0]) == 'Throttling'
+    assert sorted(snapshot.call_args_list[-1][0][0]) == ['.', 'moduledir', 'test.template.json', 'test.txt']
@@ -48,3 +48,21 @@ def runner(loader, tmpdir):
 ])
 def test_yaml_tag(runner, input, expected):
     runner(input, expected)
+
+
+def test_template_loader_matches_pure_python_loader():
+    import yaml
+    from formica import yaml_tags
+    template = 'Resources:\n  A: !If [B, !GetAtt C.D, !Sub "${E}"]\n  F: !Ref G\n  H: [1, 2.5, "3", true]'
+    assert yaml_tags.load(template) == yaml.full_load(template)
+    assert yaml_tags.load(template)['Resources']['A'] == {
+        'Fn::If': ['B', {'Fn::GetAtt': ['C', 'D']}, {'Fn::Sub': '${E}'}]}
+
+
+def test_template_loader_uses_libyaml_when_available():
+    import yaml
+    from formica import yaml_tags
+    if yaml.__with_libyaml__:
+        assert issubclass(yaml_tags.TemplateLoader, yaml.CFullLoader)
+    else:
+        assert issubclass(yaml_tags.TemplateLoader, yaml.FullLoader)